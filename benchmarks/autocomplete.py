@@ -0,0 +1,92 @@
+"""Подсказки по пользователям и группам из индекса в памяти.
+
+Строит posts.autocomplete.PrefixIndex для синтетических пользователей
+и групп без базы и замеряет время построения, объём памяти и задержку
+поиска (p50/p99) для префиксов разной длины вместе со сборкой ответа:
+подписью и адресом каждой подсказки.
+
+Запуск: python benchmarks/autocomplete.py [--users 1000000]
+"""
+import argparse
+import random
+import statistics
+import string
+import sys
+import time
+
+from utils import report
+
+from posts import autocomplete
+
+FIRST_NAMES = ('Иван', 'Пётр', 'Анна', 'Мария', 'Олег', 'Ольга', 'Денис',
+               'Елена', 'Сергей', 'Алина', '')
+LAST_NAMES = ('Иванов', 'Петрова', 'Смирнов', 'Кузнецова', 'Попов',
+              'Соколова', 'Лебедев', 'Новикова', '')
+
+
+def records(users, groups):
+    random.seed(0)
+    for pk in range(1, users + 1):
+        username = ''.join(random.choices(string.ascii_lowercase, k=6))
+        yield autocomplete.user_record(
+            pk, f'{username}{pk}', random.choice(FIRST_NAMES),
+            random.choice(LAST_NAMES))
+    for pk in range(1, groups + 1):
+        yield autocomplete.group_record(
+            pk, f'group-{pk}', f'Группа номер {pk}')
+
+
+def latencies(queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        autocomplete.search(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return (f'p50 {statistics.median(timings):.3f} мс, '
+            f'p99 {timings[int(len(timings) * 0.99)]:.3f} мс')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--groups', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = autocomplete.PrefixIndex(records(args.users, args.groups))
+    built = time.perf_counter() - started
+    memory = sys.getsizeof(index.entries) + sum(
+        map(sys.getsizeof, index.entries))
+    autocomplete._index = index
+
+    random.seed(1)
+    letters = string.ascii_lowercase
+    rows = [
+        ('записей в индексе', len(index.entries)),
+        ('построение, с', f'{built:.1f}'),
+        ('память, МБ', f'{memory / 2 ** 20:.0f}'),
+    ]
+    for length in (1, 2, 4):
+        queries = [''.join(random.choices(letters, k=length))
+                   for _ in range(args.queries)]
+        rows.append((f'username, префикс {length}', latencies(queries)))
+    names = [random.choice(FIRST_NAMES + LAST_NAMES)[:3] or 'ив'
+             for _ in range(args.queries)]
+    rows.append(('имя или фамилия, 3 буквы', latencies(names)))
+    rows.append(('группа', latencies(['групп'] * args.queries)))
+    renames = 1000
+    started = time.perf_counter()
+    for pk in range(1, renames + 1):
+        autocomplete.changed(
+            autocomplete.user_record(pk, f'user{pk}', '', ''),
+            autocomplete.user_record(pk, f'renamed{pk}', '', ''))
+    elapsed = (time.perf_counter() - started) * 1000 / renames
+    rows.append(('переименование через сигнал, мс', f'{elapsed:.3f}'))
+    report(f'Подсказки: {args.users} пользователей, {args.groups} групп',
+           rows)
+
+
+if __name__ == '__main__':
+    main()
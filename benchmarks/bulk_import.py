@@ -0,0 +1,98 @@
+"""Загрузка постов: по одному через ORM против import_data пачками.
+
+Пишет во временный каталог JSONL с синтетическими постами и
+загружает их во временную базу командой import_data, вместе с
+пересчётом счётчиков, лент и поиска. Для сравнения - Post.objects.create
+по одному со всеми сигналами на небольшой выборке. Пик памяти
+импорта замеряется для двух размеров файла: он не должен расти
+вместе с файлом.
+
+Запуск: python benchmarks/bulk_import.py [--posts 100000]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+
+from utils import report, scratch_database
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def write_posts(path, count, authors=1000):
+    with open(path, 'w', encoding='utf-8') as file_:
+        for number in range(count):
+            file_.write(json.dumps({
+                'author': f'author{number % authors}',
+                'group': f'group{number % 50}',
+                'text': f'Импортированный пост номер {number} о котах',
+                'pub_date': f'2020-01-01T00:{number // 60 % 60:02}:'
+                            f'{number % 60:02}',
+            }, ensure_ascii=False) + '\n')
+
+
+def import_posts(path):
+    call_command('import_data', 'posts', path, stdout=StringIO(),
+                 stderr=StringIO())
+
+
+def one_by_one(count):
+    author = User.objects.create(username='single')
+    group = Group.objects.create(title='Группа', slug='single')
+    started = time.perf_counter()
+    for number in range(count):
+        Post.objects.create(author=author, group=group,
+                            text=f'Пост номер {number} о котах')
+    return count / (time.perf_counter() - started)
+
+
+def peak_memory(path):
+    tracemalloc.start()
+    import_posts(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--single', type=int, default=2000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        big = os.path.join(directory, 'big.jsonl')
+        small = os.path.join(directory, 'small.jsonl')
+        write_posts(big, args.posts)
+        write_posts(small, args.posts // 10)
+        rows = []
+        with scratch_database():
+            rate = one_by_one(args.single)
+            rows.append(('по одному через ORM, постов/с', f'{rate:.0f}'))
+        with scratch_database():
+            started = time.perf_counter()
+            import_posts(big)
+            elapsed = time.perf_counter() - started
+            rows.append(('import_data с пересчётом, постов/с',
+                         f'{args.posts / elapsed:.0f}'))
+        for path, count in ((small, args.posts // 10), (big, args.posts)):
+            with scratch_database():
+                rows.append((f'пик памяти на {count} постов, МБ',
+                             f'{peak_memory(path):.1f}'))
+    finally:
+        shutil.rmtree(directory)
+    report(f'Загрузка {args.posts} постов', rows)
+
+
+if __name__ == '__main__':
+    main()
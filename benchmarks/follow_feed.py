@@ -0,0 +1,140 @@
+"""Сравнение ленты подписок: чтение при показе, раскладка и гибрид.
+
+Строит синтетический граф подписок во временной базе и замеряет:
+стоимость публикации поста популярного автора, чтение первой страницы
+и страницы глубоко в ленте для трёх схем:
+
+* pull - запрос follow_index до материализации ленты
+  (JOIN подписок и постов, COUNT(*) и OFFSET);
+* push - все посты разложены по лентам читателей;
+* hybrid - посты авторов с числом подписчиков от порога
+  читаются при показе, остальные разложены.
+
+Запуск: python benchmarks/follow_feed.py [--readers 300]
+"""
+import argparse
+import random
+
+from utils import measure, report, scratch_database
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test.utils import override_settings
+
+from posts import feeds
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+def build_graph(readers, stars, authors, follows, star_posts, author_posts):
+    random.seed(0)
+    User.objects.bulk_create(
+        User(username=f'reader{i}') for i in range(readers))
+    User.objects.bulk_create(User(username=f'star{i}') for i in range(stars))
+    User.objects.bulk_create(
+        User(username=f'author{i}') for i in range(authors))
+    reader_ids = list(User.objects.filter(
+        username__startswith='reader').values_list('pk', flat=True))
+    star_ids = list(User.objects.filter(
+        username__startswith='star').values_list('pk', flat=True))
+    author_ids = list(User.objects.filter(
+        username__startswith='author').values_list('pk', flat=True))
+    Follow.objects.bulk_create(
+        (Follow(user_id=reader, author_id=author)
+         for reader in reader_ids
+         for author in star_ids + random.sample(author_ids, follows)),
+        batch_size=500,
+    )
+    Post.objects.bulk_create(
+        (Post(author_id=author, text=f'Пост {i}')
+         for author, count in (
+             [(star, star_posts) for star in star_ids]
+             + [(author, author_posts) for author in author_ids])
+         for i in range(count)),
+        batch_size=500,
+    )
+    return reader_ids, star_ids
+
+
+def pull_page(reader, number):
+    posts = Post.objects.filter(author__following__user=reader)
+    page = Paginator(posts, settings.POSTS_LIMIT).page(number)
+    return list(page)
+
+
+def keyset_page(reader, cursor):
+    feed = feeds.follow_feed(reader)
+    return feed.fetch(cursor, False, settings.POSTS_LIMIT + 1)
+
+
+def deep_cursor(reader, depth):
+    """Ключ последнего поста перед страницей номер depth + 1."""
+    post = Post.objects.filter(author__following__user=reader).order_by(
+        '-pub_date', '-pk')[depth * settings.POSTS_LIMIT - 1]
+    return post.pub_date, post.pk
+
+
+def per_reader(read, readers):
+    """Медианное время чтения на одного читателя, мс."""
+    total = measure(lambda: [read(reader) for reader in readers])
+    return f'{total / len(readers):.2f}'
+
+
+def scheme_rows(name, readers, star, depth):
+    cache.delete(feeds.PULL_AUTHORS_KEY)
+    feeds.rebuild()
+    entries = FeedEntry.objects.count()
+    cursors = {reader: deep_cursor(reader, depth) for reader in readers}
+
+    def publish():
+        Post.objects.create(author_id=star, text='Новый пост').delete()
+
+    return [
+        (f'{name}: строк в лентах', entries),
+        (f'{name}: публикация поста звезды, мс', f'{measure(publish):.2f}'),
+        (f'{name}: первая страница, мс',
+         per_reader(lambda reader: keyset_page(reader, None), readers)),
+        (f'{name}: страница {depth + 1}, мс',
+         per_reader(lambda reader: keyset_page(reader, cursors[reader]),
+                    readers)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=300)
+    parser.add_argument('--stars', type=int, default=5)
+    parser.add_argument('--authors', type=int, default=300)
+    parser.add_argument('--follows', type=int, default=20)
+    parser.add_argument('--star-posts', type=int, default=100)
+    parser.add_argument('--author-posts', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=50)
+    args = parser.parse_args()
+
+    with scratch_database():
+        readers, stars = build_graph(
+            args.readers, args.stars, args.authors, args.follows,
+            args.star_posts, args.author_posts)
+        sample = readers[:20]
+        depth = args.depth
+        rows = [
+            ('pull: первая страница, мс',
+             per_reader(lambda reader: pull_page(reader, 1), sample)),
+            (f'pull: страница {depth + 1}, мс',
+             per_reader(lambda reader: pull_page(reader, depth + 1), sample)),
+        ]
+        with override_settings(FEED_PULL_THRESHOLD=args.readers + 1):
+            rows += scheme_rows('push', sample, stars[0], depth)
+        with override_settings(FEED_PULL_THRESHOLD=args.readers):
+            rows += scheme_rows('hybrid', sample, stars[0], depth)
+        report(
+            f'Лента подписок: {args.readers} читателей, {args.stars} звёзд, '
+            f'{args.authors} авторов, {args.follows} подписок на читателя',
+            rows)
+
+
+if __name__ == '__main__':
+    main()
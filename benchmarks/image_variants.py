@@ -0,0 +1,120 @@
+"""Вес картинок на странице ленты: один JPEG 960x339 против srcset с WebP.
+
+Готовит все варианты из posts.thumbnails.VARIANTS для синтетической
+фотографии и считает, сколько байт картинок получит страница из
+POSTS_LIMIT постов на разных экранах. Браузер выбирает из srcset самую
+узкую ширину не меньше, чем ширина картинки на экране в пикселях
+устройства; при поддержке WebP берёт вариант из <source type="image/webp">.
+Качество оценивается PSNR относительно точного уменьшения без сжатия.
+
+Запуск: python benchmarks/image_variants.py [--size 1920x1280]
+"""
+import argparse
+import io
+import math
+import tempfile
+
+from utils import report, scratch_database
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import override_settings
+from PIL import Image, ImageChops, ImageFilter, ImageStat
+from sorl.thumbnail import default
+
+from posts import tasks, thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+# Ширина картинки на экране в CSS-пикселях и плотность пикселей.
+SCREENS = (
+    ('телефон 360px, 2x', 360, 2),
+    ('телефон 414px, 3x', 414, 3),
+    ('планшет 768px, 1x', 768, 1),
+    ('ноутбук 1366px, 1x', 960, 1),
+)
+
+
+def photo(width, height):
+    """Картинка с плавными переходами и шумом, похожая на фотографию."""
+    image = Image.merge('RGB', [
+        Image.linear_gradient('L').resize((width, height)),
+        Image.radial_gradient('L').resize((width, height)),
+        Image.effect_noise((width, height), 40),
+    ]).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def psnr(image, reference):
+    diff = ImageChops.difference(image.convert('RGB'), reference)
+    mse = sum(value ** 2 for value in ImageStat.Stat(diff).rms) / 3
+    return 10 * math.log10(255 ** 2 / mse) if mse else math.inf
+
+
+def pick(width, files):
+    """Вариант, который браузер выберет для ширины width."""
+    wide_enough = [key for key in files if key >= width]
+    return files[min(wide_enough) if wide_enough else max(files)]
+
+
+def crop_box(source, image):
+    """Центральная область источника с пропорциями миниатюры."""
+    ratio = image.width / image.height
+    width = min(source.width, round(source.height * ratio))
+    height = round(width / ratio)
+    left = (source.width - width) // 2
+    top = (source.height - height) // 2
+    return left, top, left + width, top + height
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', default='1920x1280')
+    args = parser.parse_args()
+    width, height = map(int, args.size.split('x'))
+
+    with scratch_database(), override_settings(
+            MEDIA_ROOT=tempfile.mkdtemp()):
+        post = Post.objects.create(
+            author=User.objects.create(username='author'),
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('photo.jpg', photo(width, height)),
+        )
+        tasks.run_pending()
+        source = Image.open(post.image.path).convert('RGB')
+        rows, files = [], {'jpeg': {}, 'webp': {}}
+        for variant_width in thumbnails.WIDTHS:
+            for kind, options in (('jpeg', {}), ('webp', thumbnails.WEBP)):
+                geometry_string, options = thumbnails.variant(
+                    variant_width, **options)
+                thumbnail = default.backend.get_thumbnail(
+                    post.image, geometry_string, **options)
+                with thumbnail.storage.open(thumbnail.name) as file_:
+                    image = Image.open(io.BytesIO(file_.read()))
+                    image.load()
+                reference = source.resize(
+                    image.size, Image.LANCZOS, box=crop_box(source, image))
+                files[kind][variant_width] = thumbnail.storage.size(
+                    thumbnail.name)
+                rows.append((
+                    f'{kind} {geometry_string}: байт / PSNR, дБ',
+                    f'{files[kind][variant_width]} / '
+                    f'{psnr(image, reference):.1f}'))
+
+        per_page = settings.POSTS_LIMIT
+        before = files['jpeg'][max(thumbnails.WIDTHS)] * per_page
+        rows.append((f'раньше: {per_page} x JPEG 960, байт', before))
+        for name, css_width, density in SCREENS:
+            after = pick(css_width * density, files['webp']) * per_page
+            rows.append((
+                f'{name}: WebP из srcset, байт',
+                f'{after} ({after / before:.0%} от прежнего)'))
+        report(f'Варианты картинки {args.size}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Пропускная способность одного воркера при раздаче медиафайлов.
+
+Прогоняет запросы к /media/ через WSGI-обработчик Django в одном потоке
+и считает запросы в секунду и мегабайты в секунду для схем:
+
+* stream - без wsgi.file_wrapper: файл читается в Python блоками
+  FileResponse.block_size и отдаётся итератором;
+* sendfile - wsgi.file_wrapper, который, как gunicorn, передаёт файл
+  ядру через os.sendfile;
+* range - Range на 64 КБ из середины файла;
+* x-accel - MEDIA_SENDFILE='x-accel': воркер отдаёт только заголовки.
+
+Тело пишется в /dev/null, поэтому замер показывает время воркера,
+а не сети: именно его освобождают sendfile и X-Accel-Redirect.
+
+Запуск: python benchmarks/media_serving.py [--sizes 100 5000] [--repeat 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+from wsgiref.util import setup_testing_defaults
+
+from utils import report
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.test.utils import override_settings
+
+
+class SendfileWrapper:
+    """wsgi.file_wrapper, отдающий файл через os.sendfile."""
+
+    def __init__(self, filelike, block_size=8192):
+        self.filelike = filelike
+        self.block_size = block_size
+
+    def __iter__(self):
+        return iter(lambda: self.filelike.read(self.block_size), b'')
+
+    def close(self):
+        self.filelike.close()
+
+
+def consume(result, sink):
+    """Пишет тело ответа в sink так, как это делает WSGI-сервер."""
+    sent = 0
+    try:
+        filelike = getattr(result, 'filelike', None)
+        if filelike is not None and hasattr(filelike, 'fileno'):
+            fileno = filelike.fileno()
+            offset = os.lseek(fileno, 0, os.SEEK_CUR)
+            size = os.fstat(fileno).st_size - offset
+            while sent < size:
+                sent += os.sendfile(sink, fileno, offset + sent, size - sent)
+        else:
+            for chunk in result:
+                sent += os.write(sink, chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return sent
+
+
+def serve(handler, path, sink, file_wrapper=None, headers=None):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+    environ.update(headers or {})
+    setup_testing_defaults(environ)
+    if file_wrapper is not None:
+        environ['wsgi.file_wrapper'] = file_wrapper
+    status = []
+    result = handler(environ, lambda code, headers: status.append(code))
+    sent = consume(result, sink)
+    assert status[0][:3] in ('200', '206'), status
+    return sent
+
+
+def throughput(func, repeat):
+    """Запросов в секунду и МБ/с при repeat последовательных запросах."""
+    sent = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        sent += func()
+    elapsed = time.perf_counter() - started
+    megabytes = sent / elapsed / 2 ** 20
+    return f'{repeat / elapsed:8.0f} зап/с {megabytes:8.0f} МБ/с'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 5000],
+                        help='размеры файлов в КБ')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    media_root = tempfile.mkdtemp()
+    sink = os.open(os.devnull, os.O_WRONLY)
+    rows = []
+    with override_settings(MEDIA_ROOT=media_root, DEBUG=False,
+                           ALLOWED_HOSTS=['*']):
+        handler = WSGIHandler()
+        for size in args.sizes:
+            name = f'file_{size}.jpg'
+            with open(os.path.join(media_root, name), 'wb') as file_:
+                file_.write(os.urandom(size * 1024))
+            path = settings.MEDIA_URL + name
+            middle = size * 512
+            schemes = {
+                'stream': lambda: serve(handler, path, sink),
+                'sendfile': lambda: serve(
+                    handler, path, sink, SendfileWrapper),
+                'range 64 КБ': lambda: serve(
+                    handler, path, sink, SendfileWrapper, {
+                        'HTTP_RANGE': f'bytes={middle}-{middle + 65535}'}),
+            }
+            for scheme, func in schemes.items():
+                rows.append((f'{size} КБ, {scheme}',
+                             throughput(func, args.repeat)))
+            with override_settings(MEDIA_SENDFILE='x-accel'):
+                rows.append((f'{size} КБ, x-accel', throughput(
+                    lambda: serve(handler, path, sink), args.repeat)))
+    os.close(sink)
+    report('Раздача медиа одним воркером', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Время рендеринга и размер главной страницы в зависимости от числа постов.
+
+Для каждого размера базы замеряет первую страницу и страницу из середины
+ленты: как её отдаёт вью с окном номеров страниц и сколько весил бы
+блок пагинатора со ссылками на все страницы, как было раньше.
+
+Запуск: python benchmarks/paginator_render.py [--posts 1000 10000 100000]
+"""
+import argparse
+
+from utils import measure, report, scratch_database
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client
+
+from posts.models import Post
+from posts.views import paginator
+
+User = get_user_model()
+
+
+def grow(author, total):
+    """Дописывает постов, пока их не станет total."""
+    missing = total - Post.objects.count()
+    Post.objects.bulk_create(
+        (Post(author=author, text=f'Пост {i}') for i in range(missing)),
+        batch_size=500,
+    )
+
+
+def render_page(client, number):
+    cache.clear()
+    return client.get('/', {'page': number})
+
+
+def full_range_size(response):
+    """Размер блока пагинатора со ссылками на все страницы."""
+    page_obj = response.context['page_obj']
+    return len(render_to_string('includes/paginator.html', {
+        'page_obj': page_obj,
+        'page_range': page_obj.paginator.page_range,
+    }).encode())
+
+
+def window_size(response):
+    page_obj = response.context['page_obj']
+    return len(render_to_string('includes/paginator.html', paginator(
+        page_obj.paginator.object_list, response.wsgi_request)).encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--posts', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    with scratch_database():
+        author = User.objects.create(username='author')
+        client = Client()
+        rows = []
+        for total in sorted(args.posts):
+            grow(author, total)
+            middle = max(total // 20, 1)
+            for number in (1, middle):
+                response = render_page(client, number)
+                timing = measure(lambda: render_page(client, number))
+                rows += [
+                    (f'{total} постов, стр. {number}: рендеринг, мс',
+                     f'{timing:.2f}'),
+                    (f'{total} постов, стр. {number}: страница, байт',
+                     len(response.content)),
+                    (f'{total} постов, стр. {number}: пагинатор, байт',
+                     window_size(response)),
+                    (f'{total} постов, стр. {number}: все номера, байт',
+                     full_range_size(response)),
+                ]
+        report('Главная страница и окно номеров страниц', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Цена замеров RequestBudgetMiddleware и вывода каждого SQL в лог.
+
+Отдаёт главную страницу без кеша тремя способами: без замеров, с
+RequestBudgetMiddleware и шаблонами с таймером, и без замеров, но с
+прежней настройкой - каждый SQL-запрос пишется в лог (при DEBUG=True,
+вывод - в /dev/null). Панель отладки отключена во всех трёх.
+
+Запуск: python benchmarks/request_budget.py [--posts 1000]
+"""
+import argparse
+import contextlib
+import logging
+import os
+
+from utils import measure, report, scratch_database
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, override_settings
+
+from posts.models import Group, Post
+
+User = get_user_model()
+BUDGET = 'core.middleware.RequestBudgetMiddleware'
+TOOLBAR = 'debug_toolbar.middleware.DebugToolbarMiddleware'
+
+
+def plain_templates():
+    templates = [dict(engine) for engine in settings.TEMPLATES]
+    templates[0]['BACKEND'] = (
+        'django.template.backends.django.DjangoTemplates')
+    return templates
+
+
+@contextlib.contextmanager
+def sql_logging(middleware):
+    logger = logging.getLogger('django.db.backends')
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    saved = logger.handlers, logger.level
+    logger.handlers, logger.level = [handler], logging.DEBUG
+    try:
+        with override_settings(DEBUG=True, MIDDLEWARE=middleware,
+                               TEMPLATES=plain_templates()):
+            yield
+    finally:
+        logger.handlers, logger.level = saved
+        handler.stream.close()
+
+
+def page_time(repeat):
+    client = Client()
+
+    def get():
+        cache.clear()
+        client.get('/')
+    get()
+    return measure(get, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    without = [name for name in settings.MIDDLEWARE
+               if name not in (BUDGET, TOOLBAR)]
+    schemes = (
+        ('без замеров', lambda: override_settings(
+            MIDDLEWARE=without, TEMPLATES=plain_templates())),
+        ('RequestBudgetMiddleware', lambda: override_settings(
+            MIDDLEWARE=[BUDGET, *without])),
+        ('каждый SQL в лог', lambda: sql_logging(without)),
+    )
+    rows = []
+    with scratch_database():
+        author = User.objects.create(username='author')
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.bulk_create(
+            (Post(author=author, group=group, text=f'Пост {number}')
+             for number in range(args.posts)),
+            batch_size=500,
+        )
+        for name, scheme in schemes:
+            with scheme():
+                rows.append((f'{name}, мс', f'{page_time(args.repeat):.3f}'))
+    report('Главная страница без кеша, медиана', rows)
+
+
+if __name__ == '__main__':
+    main()
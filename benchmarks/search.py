@@ -0,0 +1,89 @@
+"""Поиск по постам: LIKE по тексту против индекса FTS5 с основами слов.
+
+Заполняет временную базу синтетическими постами из словаря русских
+слов в разных формах и замеряет первую страницу результатов, страницу
+по курсору и подсчёт совпадений для редкого и частого слова. Для
+сравнения - прежний поиск админки: text LIKE '%...%' с COUNT(*).
+
+Запуск: python benchmarks/search.py [--posts 100000]
+"""
+import argparse
+import random
+
+from utils import measure, report, scratch_database
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+# Основы и окончания; из них собираются слова в разных формах.
+STEMS = (
+    'кот', 'дом', 'город', 'книг', 'работ', 'дорог', 'друг', 'вечер',
+    'солнц', 'мор', 'лес', 'реки', 'поезд', 'музык', 'фотограф', 'завтрак',
+)
+ENDINGS = ('', 'а', 'ы', 'ами', 'ов', 'е', 'ом', 'у')
+RARE = 'фотографами'
+COMMON = 'дорогой'
+
+
+def build_posts(count):
+    random.seed(0)
+    author = User.objects.create(username='author')
+    vocabulary = [stem + ending for stem in STEMS for ending in ENDINGS]
+    # Частота слов убывает, как в живом тексте: первые основы - в каждом
+    # втором посте, последние - в сотых долях.
+    weights = [1 / (rank + 1) ** 1.5 for rank in range(len(vocabulary))]
+    random.shuffle(vocabulary)
+    vocabulary.sort(key=lambda word: word.startswith('фотограф'))
+    Post.objects.bulk_create(
+        (Post(author=author, text=' '.join(
+            random.choices(vocabulary, weights, k=12)))
+         for _ in range(count)),
+        batch_size=500,
+    )
+    search.rebuild()
+
+
+def like_page(word):
+    posts = Post.objects.filter(text__icontains=word).order_by('-pub_date')
+    return posts.count(), list(posts[:settings.POSTS_LIMIT])
+
+
+def fts_page(word, cursor=None):
+    results = search.SearchResults(word)
+    return list(results.fetch(cursor, False, settings.POSTS_LIMIT + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=100000)
+    args = parser.parse_args()
+
+    with scratch_database():
+        build_posts(args.posts)
+        rows = []
+        for label, word in (('редкое', RARE), ('частое', COMMON)):
+            results = search.SearchResults(word)
+            total = results.count()
+            page = fts_page(word)
+            cursor = results.key(page[-1]) if page else None
+            rows += [
+                (f'{label} «{word}»: ранжируемых совпадений', total),
+                (f'{label}: LIKE + COUNT(*), мс',
+                 f'{measure(lambda: like_page(word), 5):.1f}'),
+                (f'{label}: FTS5, первая страница, мс',
+                 f'{measure(lambda: fts_page(word)):.1f}'),
+                (f'{label}: FTS5, страница по курсору, мс',
+                 f'{measure(lambda: fts_page(word, cursor)):.1f}'),
+                (f'{label}: FTS5, число совпадений, мс',
+                 f'{measure(results.count):.1f}'),
+            ]
+        report(f'Поиск по {args.posts} постам', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Смешанная нагрузка на SQLite: настройки по умолчанию против WAL и pragma.
+
+Создаёт файловую базу со всеми миграциями и запускает несколько
+процессов-воркеров. Каждый воркер в цикле читает первую страницу
+главной или, с долей --writes, публикует пост со всеми сигналами.
+Сравниваются схемы:
+
+* по умолчанию - журнал DELETE, без pragma, новое соединение на запрос;
+* pragma - SQLITE_PRAGMAS, но новое соединение на запрос;
+* pragma + CONN_MAX_AGE - SQLITE_PRAGMAS и постоянное соединение.
+
+Запуск: python benchmarks/sqlite_tuning.py [--workers 4] [--seconds 3]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from utils import report
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+SCHEMES = (
+    ('по умолчанию', {}, False),
+    ('pragma', settings.SQLITE_PRAGMAS, False),
+    ('pragma + CONN_MAX_AGE', settings.SQLITE_PRAGMAS, True),
+)
+
+
+def use_database(path):
+    connections.close_all()
+    connection.settings_dict['NAME'] = path
+
+
+def build_database(path, posts):
+    """Файловая база с пользователями, группой и постами."""
+    use_database(path)
+    with override_settings(SQLITE_PRAGMAS={}):
+        call_command('migrate', verbosity=0)
+        authors = User.objects.bulk_create(
+            User(username=f'author{i}') for i in range(20))
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.bulk_create(
+            (Post(author=User.objects.get(username=f'author{i % 20}'),
+                  group=group, text=f'Пост {i}') for i in range(posts)),
+            batch_size=500,
+        )
+    connections.close_all()
+    return len(authors)
+
+
+def work(path, pragmas, persistent, writes, seconds, results):
+    random.seed(os.getpid())
+    use_database(path)
+    authors = list(User.objects.values_list('pk', flat=True))
+    reads = written = errors = 0
+    with override_settings(DEBUG=False, SQLITE_PRAGMAS=pragmas):
+        connections.close_all()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            try:
+                if random.random() < writes:
+                    Post.objects.create(
+                        author_id=random.choice(authors), text='Новый пост')
+                    written += 1
+                else:
+                    list(Post.objects.select_related(
+                        'author', 'group')[:settings.POSTS_LIMIT])
+                    reads += 1
+            except OperationalError:
+                errors += 1
+            if not persistent:
+                connection.close()
+    connections.close_all()
+    results.put((reads, written, errors))
+
+
+def run(template, directory, scheme, args):
+    name, pragmas, persistent = scheme
+    path = os.path.join(directory, f'{len(os.listdir(directory))}.sqlite3')
+    shutil.copy(template, path)
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [
+        context.Process(target=work, args=(
+            path, pragmas, persistent, args.writes, args.seconds, results))
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    totals = [sum(values) for values in zip(
+        *(results.get() for _ in workers))]
+    for worker in workers:
+        worker.join()
+    reads, written, errors = (value / args.seconds for value in totals)
+    return name, (f'чтений {reads:7.0f}/с  записей {written:6.0f}/с  '
+                  f'ошибок {errors:.0f}/с')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--writes', type=float, default=0.1,
+                        help='доля записей')
+    parser.add_argument('--posts', type=int, default=5000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    template = os.path.join(directory, 'template.sqlite3')
+    build_database(template, args.posts)
+    work_directory = tempfile.mkdtemp()
+    try:
+        rows = [run(template, work_directory, scheme, args)
+                for scheme in SCHEMES]
+    finally:
+        shutil.rmtree(directory)
+        shutil.rmtree(work_directory)
+    report(f'{args.workers} воркеров, доля записей {args.writes:.0%}', rows)
+
+
+if __name__ == '__main__':
+    main()
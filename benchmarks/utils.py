@@ -0,0 +1,50 @@
+"""Общие помощники для замеров: окружение Django и временная база."""
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    setup_test_environment, teardown_test_environment,
+)
+
+
+@contextlib.contextmanager
+def scratch_database():
+    """Создаёт чистую тестовую базу со всеми миграциями и удаляет её."""
+    setup_test_environment(debug=False)
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func, repeat=20):
+    """Медиана времени вызова func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def report(title, rows):
+    """Печатает таблицу результатов."""
+    print(f'\n{title}')
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f'  {name:<{width}}  {value}')
@@ -0,0 +1,104 @@
+import random
+import sqlite3
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Состояние текущего запроса: вью разрешила чтение с реплик (replica),
+# запрос закреплён за default (pinned), в этом запросе была запись (wrote).
+_local = threading.local()
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению с SQLite.
+
+    Большинство настроек действует только в пределах соединения, поэтому
+    их нужно задавать при каждом подключении; journal_mode=WAL
+    сохраняется в самом файле базы.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def replica_alias():
+    """Реплика для чтения или None, если читать нужно из default."""
+    if (not settings.DATABASE_REPLICAS
+            or not getattr(_local, 'replica', False)
+            or getattr(_local, 'pinned', False)
+            or getattr(_local, 'wrote', False)):
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+def replica_reads(view):
+    """Разрешает вью и её шаблону читать с реплик."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        previous = getattr(_local, 'replica', False)
+        _local.replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.replica = previous
+    return wrapper
+
+
+def pin(pinned=False):
+    """Начинает запрос: pinned - читать только из default."""
+    _local.pinned = pinned
+    _local.wrote = False
+
+
+def wrote():
+    return getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    """Чтение вью под replica_reads - с реплик, остальное - из default.
+
+    Запись всегда идёт в default и закрепляет за ним остаток запроса,
+    а через куку ReplicaPinMiddleware - и следующие запросы того, кто
+    писал, пока реплики могут отставать: свои изменения видны сразу.
+    Чтение внутри транзакции и чтение сессий тоже остаются в default:
+    сессии, которой ещё нет на реплике, Django посчитал бы устаревшей.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (model._meta.app_label == 'sessions'
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return replica_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label not in settings.REPLICA_UNPINNED_MODELS:
+            _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def copy_database(source, target):
+    """Копирует базу SQLite source в target через backup API.
+
+    Копия согласована даже при записи в source, а target обновляется на
+    месте, поэтому открытые соединения реплики видят новые данные.
+    """
+    origin, copy = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        origin.backup(copy)
+    finally:
+        origin.close()
+        copy.close()
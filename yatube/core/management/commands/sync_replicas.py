@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core.db import copy_database
+
+
+class Command(BaseCommand):
+    help = 'Копирует базу default в реплики из DATABASE_REPLICAS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Повторять копирование через столько секунд.')
+
+    def handle(self, *args, **options):
+        source = settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                copy_database(source, settings.DATABASES[alias]['NAME'])
+            self.stdout.write(
+                f'Реплик обновлено: {len(settings.DATABASE_REPLICAS)}')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
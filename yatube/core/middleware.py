@@ -0,0 +1,79 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db, timing
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет за default запросы того, кто недавно писал в базу.
+
+    После запроса с записью ставит куку на REPLICA_LAG секунд - столько
+    реплики могут отставать от default; с кукой чтение идёт из default.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db.pin(settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+            if db.wrote() and settings.DATABASE_REPLICAS:
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_LAG, httponly=True)
+        finally:
+            db.pin()
+        return response
+
+
+class RequestBudgetMiddleware:
+    """Замеряет запрос и предупреждает, если он вышел за бюджет.
+
+    Для каждого запроса пишет в лог core.middleware на уровне DEBUG
+    имя URL, число запросов к базе, время базы, шаблонов и всего
+    ответа. Если запросов к базе больше REQUEST_QUERY_BUDGET или ответ
+    готовился дольше REQUEST_TIME_BUDGET секунд, то же уходит с уровнем
+    WARNING. Для отдельных URL бюджет задаётся в REQUEST_BUDGETS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = timing.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.count_query))
+                response = self.get_response(request)
+        finally:
+            timing.stop()
+        self.report(request, timings, time.perf_counter() - started)
+        return response
+
+    def report(self, request, timings, elapsed):
+        match = request.resolver_match
+        name = match.view_name if match else '-'
+        queries, seconds = settings.REQUEST_BUDGETS.get(name, (
+            settings.REQUEST_QUERY_BUDGET, settings.REQUEST_TIME_BUDGET))
+        over = ((queries is not None and timings.queries > queries)
+                or (seconds is not None and elapsed > seconds))
+        level = logging.WARNING if over else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(
+                level,
+                '%s %s: запросов к базе %d, база %.1f мс, шаблоны %.1f мс, '
+                'всего %.1f мс%s',
+                request.method, name, timings.queries, timings.db * 1000,
+                timings.template * 1000, elapsed * 1000,
+                ' - сверх бюджета' if over else '',
+            )
@@ -0,0 +1,268 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import connection, router
+from django.template import engines
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.cache import page_ttl
+from posts.models import Post, Task
+
+from . import timing
+from .db import copy_database, replica_reads
+from .middleware import ReplicaPinMiddleware
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        cls.path = os.path.join(TEMP_MEDIA_ROOT, 'posts', 'file.gif')
+        with open(cls.path, 'wb') as file_:
+            file_.write(CONTENT)
+        cls.url = settings.MEDIA_URL + 'posts/file.gif'
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_whole_file(self):
+        """Файл отдаётся целиком с типом, датой и Accept-Ranges."""
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Last-Modified'],
+                         http_date(os.stat(self.path).st_mtime))
+
+    def test_ranges(self):
+        """Range отдаёт часть файла, невыполнимый диапазон - 416."""
+        cases = {
+            'bytes=10-19': (10, 19),
+            'bytes=1000-': (1000, len(CONTENT) - 1),
+            'bytes=-24': (len(CONTENT) - 24, len(CONTENT) - 1),
+            'bytes=1000-5000': (1000, len(CONTENT) - 1),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(header=header):
+                response = self.guest_client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT)
+                self.assertEqual(b''.join(response.streaming_content),
+                                 CONTENT[start:end + 1])
+                self.assertEqual(response['Content-Range'],
+                                 f'bytes {start}-{end}/{len(CONTENT)}')
+                self.assertEqual(
+                    response['Content-Length'], str(end - start + 1))
+        response = self.guest_client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code,
+                         HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        response = self.guest_client.get(
+            self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_conditional_requests(self):
+        """If-Modified-Since даёт 304, устаревший If-Range - весь файл."""
+        modified = http_date(os.stat(self.path).st_mtime)
+        response = self.guest_client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.guest_client.get(
+            self.url, HTTP_RANGE='bytes=0-9',
+            HTTP_IF_RANGE=http_date(os.stat(self.path).st_mtime - 60))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_missing_and_unsafe_paths(self):
+        """Чужие и несуществующие пути дают 404."""
+        for url in (settings.MEDIA_URL + 'posts/none.gif',
+                    settings.MEDIA_URL + '../manage.py',
+                    settings.MEDIA_URL + 'posts/'):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_offload_to_proxy(self):
+        """С MEDIA_SENDFILE файл отдаёт прокси, а не воркер."""
+        with self.settings(MEDIA_SENDFILE='x-accel'):
+            response = self.guest_client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         settings.MEDIA_ACCEL_PREFIX + 'posts/file.gif')
+        self.assertEqual(response.content, b'')
+        with self.settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.guest_client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.path)
+
+
+class SQLitePragmaTests(SimpleTestCase):
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_on_new_connection(self):
+        """Каждое соединение получает настройки из SQLITE_PRAGMAS."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = DatabaseWrapper(
+            {**connection.settings_dict,
+             'NAME': os.path.join(directory, 'db.sqlite3')},
+            alias='pragmas',
+        )
+        self.addCleanup(wrapper.close)
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        # synchronous=NORMAL - это 1.
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'),
+                         settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma(wrapper, 'cache_size'),
+                         settings.SQLITE_PRAGMAS['cache_size'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def call(self, view, **cookies):
+        """Вызывает view за ReplicaPinMiddleware; view отвечает алиасом."""
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies)
+        return ReplicaPinMiddleware(view)(request)
+
+    def test_reads(self):
+        """С реплики читают только вью с replica_reads."""
+        def view(request):
+            return HttpResponse(router.db_for_read(Post))
+        self.assertEqual(self.call(view).content, b'default')
+        self.assertEqual(self.call(replica_reads(view)).content, b'replica')
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+        @replica_reads
+        def session_view(request):
+            return HttpResponse(router.db_for_read(Session))
+        self.assertEqual(self.call(session_view).content, b'default')
+
+    def test_read_your_writes(self):
+        """После записи запрос и следующие запросы читают из default."""
+        @replica_reads
+        def view(request):
+            router.db_for_write(Post)
+            return HttpResponse(router.db_for_read(Post))
+        response = self.call(view)
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_LAG)
+
+        @replica_reads
+        def reader(request):
+            return HttpResponse(router.db_for_read(Post))
+        response = self.call(
+            reader, **{settings.REPLICA_PIN_COOKIE: cookie.value})
+        self.assertEqual(response.content, b'default')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_unpinned_writes(self):
+        """Служебные записи не закрепляют запрос за default."""
+        @replica_reads
+        def view(request):
+            router.db_for_write(Task)
+            return HttpResponse(router.db_for_read(Post))
+        response = self.call(view)
+        self.assertEqual(response.content, b'replica')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_page_ttl(self):
+        """Страницы с реплики живут в кеше не дольше REPLICA_LAG."""
+        @replica_reads
+        def view(request):
+            return HttpResponse(page_ttl())
+        self.assertEqual(self.call(view).content,
+                         str(settings.REPLICA_LAG).encode())
+        self.assertEqual(page_ttl(), settings.PAGE_CACHE_TTL)
+
+    def test_migrations(self):
+        """Миграции не применяются к репликам."""
+        self.assertTrue(router.allow_migrate('default', 'posts'))
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+
+
+class CopyDatabaseTests(SimpleTestCase):
+    def test_copy_replaces_replica(self):
+        """Копия повторяет основную базу и обновляется на месте."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'default.sqlite3')
+        target = os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(source) as database:
+            database.execute('CREATE TABLE post (text)')
+            database.execute("INSERT INTO post VALUES ('первый')")
+        database.close()
+        copy_database(source, target)
+        replica = sqlite3.connect(target)
+        self.addCleanup(replica.close)
+        with sqlite3.connect(source) as database:
+            database.execute("INSERT INTO post VALUES ('второй')")
+        database.close()
+        copy_database(source, target)
+        self.assertEqual(
+            replica.execute('SELECT text FROM post').fetchall(),
+            [('первый',), ('второй',)])
+
+
+class RequestBudgetTests(TestCase):
+    def get_index(self, level='DEBUG'):
+        with self.assertLogs('core.middleware', level) as logs:
+            Client().get(reverse('posts:index'))
+        return logs.records
+
+    def test_report(self):
+        """Каждый запрос пишется в лог с именем URL и замерами."""
+        record, = self.get_index()
+        self.assertEqual(record.levelname, 'DEBUG')
+        self.assertIn('GET posts:index', record.getMessage())
+
+    @override_settings(REQUEST_QUERY_BUDGET=0)
+    def test_over_budget(self):
+        """Запрос сверх бюджета попадает в лог с уровнем WARNING."""
+        record, = self.get_index('WARNING')
+        self.assertIn('сверх бюджета', record.getMessage())
+        with self.settings(REQUEST_BUDGETS={'posts:index': (None, 1)}):
+            record, = self.get_index()
+            self.assertEqual(record.levelname, 'DEBUG')
+
+    def test_timings(self):
+        """Считаются запросы к базе и время внешнего шаблона."""
+        timings = timing.start()
+        self.addCleanup(timing.stop)
+        with connection.execute_wrapper(timing.count_query):
+            Post.objects.count()
+            Post.objects.exists()
+        self.assertEqual(timings.queries, 2)
+        self.assertGreater(timings.db, 0)
+        engine = engines['timing']
+        self.assertEqual(engine.from_string('{{ value }}').render(
+            {'value': 1}), '1')
+        self.assertGreater(timings.template, 0)
+        self.assertFalse(timings.rendering)
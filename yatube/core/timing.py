@@ -0,0 +1,79 @@
+import threading
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+from django.template.backends.django import reraise
+
+# Замеры текущего запроса; вне запроса (команды, обработчик задач)
+# здесь None, и ничего не считается.
+_local = threading.local()
+
+
+class Timings:
+    """Число запросов к базе и время базы и шаблонов в секундах."""
+
+    __slots__ = ('queries', 'db', 'template', 'rendering')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = self.template = 0.0
+        self.rendering = False
+
+
+def start():
+    _local.timings = Timings()
+    return _local.timings
+
+
+def stop():
+    _local.timings = None
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+def count_query(execute, sql, params, many, context):
+    """Обёртка для connection.execute_wrapper: считает запрос и его время."""
+    timings = current()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+class Template(DjangoTemplate):
+    def render(self, context=None, request=None):
+        timings = current()
+        # Вложенный рендеринг уже входит во время внешнего шаблона.
+        if timings is None or timings.rendering:
+            return super().render(context, request)
+        timings.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template += time.perf_counter() - started
+            timings.rendering = False
+
+
+class TimedTemplates(DjangoTemplates):
+    """Шаблоны Django, которые замеряют время рендеринга для запроса.
+
+    Время шаблона включает и запросы к базе, сделанные из него.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
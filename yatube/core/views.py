@@ -1,6 +1,22 @@
+import mimetypes
+import os
+import re
 from http import HTTPStatus
+from stat import S_ISREG
+from urllib.parse import quote
 
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified,
+)
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
 
 
 def page_not_found(request, exception):
@@ -19,3 +35,119 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+class FileRange:
+    """Часть открытого файла длиной length, начиная со start."""
+
+    def __init__(self, file_, start, length):
+        file_.seek(start)
+        self.file = file_
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def byte_range(header, size):
+    """Границы (первый, последний байт) из заголовка Range.
+
+    Поддерживается один диапазон: для нескольких диапазонов или
+    испорченного заголовка возвращается None, и отдаётся весь файл,
+    как разрешает RFC 7233. Диапазон за концом файла - ValueError.
+    """
+    match = BYTE_RANGE.match(header or '')
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        if int(last) == 0:
+            raise ValueError('Пустой диапазон')
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('Диапазон за концом файла')
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def guess_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def offloaded(path, fullpath):
+    """Пустой ответ, по заголовку которого файл отдаёт прокси."""
+    response = HttpResponse(content_type=guess_type(fullpath))
+    if settings.MEDIA_SENDFILE == 'x-accel':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX + path)
+    else:
+        response['X-Sendfile'] = fullpath
+    return response
+
+
+def streamed(request, fullpath, size, last_modified):
+    """Файл или его диапазон через FileResponse."""
+    try:
+        span = byte_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(
+            status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    # Если файл поменялся с тех пор, как клиент получил начало,
+    # If-Range требует отдать его целиком.
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is not None and if_range != last_modified:
+        span = None
+    file_ = open(fullpath, 'rb')
+    if span is None:
+        response = FileResponse(file_, content_type=guess_type(fullpath))
+    else:
+        start, end = span
+        response = FileResponse(
+            FileRange(file_, start, end - start + 1),
+            status=HTTPStatus.PARTIAL_CONTENT,
+            content_type=guess_type(fullpath),
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def media(request, path):
+    """Отдаёт файл из MEDIA_ROOT.
+
+    Понимает If-Modified-Since и Range. Весь файл отдаётся через
+    FileResponse, и WSGI-сервер может передать его os.sendfile без
+    копирования через Python. При MEDIA_SENDFILE отдачу забирает
+    фронтовой прокси: nginx по X-Accel-Redirect или Apache/lighttpd
+    по X-Sendfile, а воркер сразу освобождается.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not S_ISREG(stat.st_mode):
+        raise Http404
+    last_modified = http_date(stat.st_mtime)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                              stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+    elif settings.MEDIA_SENDFILE:
+        response = offloaded(path, fullpath)
+    else:
+        response = streamed(request, fullpath, stat.st_size, last_modified)
+    response['Last-Modified'] = last_modified
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
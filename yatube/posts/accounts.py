@@ -0,0 +1,141 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import thumbnails
+from .models import (
+    AccountDeletion, ArchivedComment, ArchivedPost, Comment, FeedEntry, Follow,
+    Post,
+)
+from .tasks import enqueue, task
+
+User = get_user_model()
+
+
+def steps(user_id):
+    """Шаги удаления по порядку: (имя, записи пользователя).
+
+    Подписки на автора снимаются раньше его постов: иначе каждый
+    удалённый пост сбрасывал бы ленты всех подписчиков. Чужие
+    комментарии к постам удаляются своими порциями до постов, чтобы
+    удаление поста не тянуло их все за собой в одной транзакции.
+    """
+    return (
+        ('comments', Comment.objects.filter(author_id=user_id)),
+        ('followers', Follow.objects.filter(author_id=user_id)),
+        ('following', Follow.objects.filter(user_id=user_id)),
+        ('feed', FeedEntry.objects.filter(user_id=user_id)),
+        ('replies', Comment.objects.filter(
+            post__author_id=user_id).exclude(author_id=user_id)),
+        ('posts', Post.objects.filter(author_id=user_id)),
+        ('archived_comments',
+         ArchivedComment.objects.filter(author_id=user_id)),
+        ('archived_replies', ArchivedComment.objects.filter(
+            post__author_id=user_id).exclude(author_id=user_id)),
+        ('archived_posts', ArchivedPost.objects.filter(author_id=user_id)),
+    )
+
+
+@transaction.atomic
+def request_deletion(user):
+    """Отключает пользователя и ставит удаление его записей в очередь.
+
+    Отключённый пользователь не может войти, а его открытые сессии
+    перестают действовать сразу.
+    """
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    deletion = AccountDeletion.objects.filter(
+        user=user, finished__isnull=True).first()
+    if deletion is None:
+        deletion = AccountDeletion.objects.create(
+            user=user,
+            username=user.username,
+            total=sum(rows.count() for _, rows in steps(user.pk)),
+        )
+        enqueue(delete_account, deletion_id=deletion.pk)
+    return deletion
+
+
+@task
+def delete_account(deletion_id, part=0):
+    """Удаляет записи порциями, пока не выйдет ACCOUNT_DELETION_BUDGET.
+
+    Каждая порция - отдельная транзакция, а между порциями пауза: база
+    не блокируется надолго, и чужие запросы успевают записать своё.
+    Остаток работы ставится в очередь следующей частью задачи.
+    """
+    deletion = AccountDeletion.objects.filter(
+        pk=deletion_id, finished__isnull=True).first()
+    if deletion is None:
+        return
+    deadline = time.monotonic() + settings.ACCOUNT_DELETION_BUDGET
+    while delete_chunk(deletion):
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(settings.ACCOUNT_DELETION_PAUSE)
+    else:
+        return
+    enqueue(delete_account, deletion_id=deletion_id, part=part + 1)
+
+
+def delete_chunk(deletion):
+    """Удаляет одну порцию записей; False, если удалять больше нечего.
+
+    Записи удаляются через ORM, поэтому сигналы поправляют счётчики,
+    ленты, поисковый индекс и поколения кеша так же, как при удалении
+    по одной.
+    """
+    for step, rows in steps(deletion.user_id):
+        pks = list(rows.order_by().values_list('pk', flat=True)[
+            :settings.ACCOUNT_DELETION_BATCH])
+        if pks:
+            break
+    else:
+        finish(deletion)
+        return False
+    rows = rows.model.objects.filter(pk__in=pks)
+    images = set()
+    with transaction.atomic():
+        if step in ('posts', 'archived_posts'):
+            images = set(rows.exclude(image='').values_list(
+                'image', flat=True))
+        rows.delete()
+        AccountDeletion.objects.filter(pk=deletion.pk).update(
+            step=step, deleted=F('deleted') + len(pks))
+    files = discard_images(images)
+    if files:
+        AccountDeletion.objects.filter(pk=deletion.pk).update(
+            files_deleted=F('files_deleted') + files)
+    return True
+
+
+def discard_images(names):
+    """Удаляет картинки, на которые больше не ссылается ни один пост.
+
+    Одинаковые картинки хранятся одним файлом, поэтому файл удалённого
+    поста может быть нужен другому.
+    """
+    if not names:
+        return 0
+    used = set()
+    for model in (Post, ArchivedPost):
+        used.update(model.objects.filter(image__in=names).values_list(
+            'image', flat=True))
+    unused = names - used
+    for name in unused:
+        thumbnails.discard(name)
+    return len(unused)
+
+
+def finish(deletion):
+    User.objects.filter(pk=deletion.user_id).delete()
+    # Часть записей (например, ленты) сигналы убирают вместе с
+    # исходными, поэтому счёт удалённых может не дойти до total.
+    deletion.deleted = deletion.total
+    deletion.finished = timezone.now()
+    deletion.step = ''
+    deletion.save(update_fields=['deleted', 'finished', 'step'])
@@ -1,6 +1,10 @@
 from django.contrib import admin
 
-from .models import Group, Post, Comment, Follow
+from . import search
+from .models import (
+    AccountDeletion, ArchivedPost, Comment, FeedEntry, Follow, Group, Post,
+    Task, UserStats,
+)
 
 
 @admin.register(Post)
@@ -17,6 +21,25 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE по search_fields - полнотекстовый индекс.
+        if not search_term:
+            return queryset, False
+        return search.filter_posts(queryset, search_term), False
+
+
+@admin.register(ArchivedPost)
+class ArchivedPostAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'text',
+        'pub_date',
+        'author',
+        'group',
+    )
+    list_filter = ('pub_date',)
+    empty_value_display = '-пусто-'
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -53,3 +76,54 @@ class FollowAdmin(admin.ModelAdmin):
     )
     search_fields = ('user', 'author',)
     list_filter = ('author',)
+
+
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'user',
+        'post',
+        'pub_date',
+    )
+    list_filter = ('user',)
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'user',
+        'posts_count',
+        'followers_count',
+        'following_count',
+    )
+    search_fields = ('user__username',)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('key', 'name', 'created', 'run_after', 'attempts')
+    list_filter = ('name',)
+    search_fields = ('key',)
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'username',
+        'requested',
+        'step',
+        'deleted',
+        'total',
+        'percent',
+        'files_deleted',
+        'finished',
+    )
+    search_fields = ('username',)
+    readonly_fields = ('user', 'username', 'total', 'deleted',
+                       'files_deleted', 'step', 'finished')
+
+    def percent(self, deletion):
+        return f'{deletion.progress:.0%}'
+    percent.short_description = 'Выполнено'
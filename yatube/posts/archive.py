@@ -0,0 +1,62 @@
+import datetime as dt
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+    'image_width', 'image_height', 'image_size', 'image_placeholder',
+    'comments_count',
+)
+COMMENT_FIELDS = ('id', 'post_id', 'author_id', 'text', 'created')
+
+
+def cutoff(days=None):
+    """Посты, опубликованные раньше этого момента, уходят в архив."""
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    return timezone.now() - dt.timedelta(days=days)
+
+
+def archive(before, batch_size=None):
+    """Переносит посты старше before в архив порциями; возвращает их число.
+
+    Каждая порция - отдельная транзакция, поэтому перенос можно
+    прервать в любой момент без потерь.
+    """
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    moved = 0
+    while True:
+        pks = list(Post.objects.filter(pub_date__lt=before).order_by(
+            'pub_date').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return moved
+        move(pks)
+        moved += len(pks)
+
+
+@transaction.atomic
+def move(pks):
+    """Копирует посты и их комментарии в архив и удаляет оригиналы."""
+    posts = Post.objects.filter(pk__in=pks).values_list(*POST_FIELDS)
+    ArchivedPost.objects.bulk_create(
+        ArchivedPost(**dict(zip(POST_FIELDS, row))) for row in posts)
+    comments = Comment.objects.filter(post_id__in=pks).values_list(
+        *COMMENT_FIELDS)
+    ArchivedComment.objects.bulk_create(
+        (ArchivedComment(**dict(zip(COMMENT_FIELDS, row)))
+         for row in comments.iterator()),
+        batch_size=settings.ARCHIVE_BATCH_SIZE)
+    authors = Counter(ArchivedPost.objects.filter(pk__in=pks).values_list(
+        'author_id', flat=True))
+    # Удаление через ORM: сигналы убирают посты из лент, поиска и
+    # счётчиков групп и сбрасывают кеш страниц. Архивные посты остаются
+    # в профиле, поэтому счётчик постов автора возвращается обратно.
+    Post.objects.filter(pk__in=pks).delete()
+    for author_id, count in authors.items():
+        counters.change_user(author_id, 'posts_count', count)
@@ -0,0 +1,179 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+
+from .models import Group
+
+User = get_user_model()
+
+# Запись индекса - строка «ключ, вид, id, адрес, имя» через SEP в UTF-8:
+# байты занимают меньше памяти, чем str с кириллицей, и сортируются
+# так же. Поиск по префиксу ключа - bisect до первой подходящей записи
+# и проход вперёд.
+SEP = '\x00'
+
+_index = None
+_lock = threading.Lock()
+_refreshing = threading.Lock()
+
+
+def normalize(text):
+    return ' '.join(text.casefold().replace('ё', 'е').replace(
+        SEP, '').split())
+
+
+def keys(*names):
+    """Ключи для имён: имя целиком и с каждого следующего слова."""
+    found = set()
+    for name in names:
+        words = normalize(name).split()
+        found.update(' '.join(words[i:]) for i in range(len(words)))
+    return found
+
+
+class PrefixIndex:
+    """Отсортированный список ключей пользователей и групп в памяти.
+
+    Ключи пользователя - username и полное имя, группы - название и
+    slug; имена ищутся и с любого слова. Изменения из сигналов
+    вставляются в список на место, без пересортировки.
+    """
+
+    def __init__(self, records=()):
+        self.entries = sorted(
+            entry for record in records for entry in entries(*record))
+        self.loaded_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        users = User.objects.values_list(
+            'pk', 'username', 'first_name', 'last_name').iterator()
+        groups = Group.objects.values_list('pk', 'slug', 'title').iterator()
+        return cls([
+            *(user_record(*row) for row in users),
+            *(group_record(*row) for row in groups),
+        ])
+
+    def replace(self, old=None, new=None):
+        """Убирает записи old и добавляет записи new."""
+        with self.lock:
+            for entry in entries(*old) if old else ():
+                position = bisect_left(self.entries, entry)
+                if self.entries[position:position + 1] == [entry]:
+                    del self.entries[position]
+            for entry in entries(*new) if new else ():
+                insort(self.entries, entry)
+
+    def search(self, prefix, limit):
+        """До limit записей, у которых ключ начинается с prefix."""
+        prefix = normalize(prefix).encode()
+        if not prefix:
+            return []
+        entries = self.entries
+        found, seen = [], set()
+        position = bisect_left(entries, prefix)
+        while position < len(entries) and len(found) < limit:
+            entry = entries[position]
+            if not entry.startswith(prefix):
+                break
+            _, kind, pk, ref, name = entry.decode().split(SEP)
+            if (kind, pk) not in seen:
+                seen.add((kind, pk))
+                found.append((kind, ref, name))
+            position += 1
+        return found
+
+
+def entries(kind, pk, ref, name):
+    """Записи индекса: по одной на ключ из ref и name."""
+    return {SEP.join((key, kind, str(pk), ref, name)).encode()
+            for key in keys(ref, name)}
+
+
+def user_record(pk, username, first_name, last_name):
+    return 'user', pk, username, f'{first_name} {last_name}'.strip()
+
+
+def group_record(pk, slug, title):
+    return 'group', pk, slug, title
+
+
+def load():
+    global _index
+    with _lock:
+        if _index is None:
+            _index = PrefixIndex.load()
+
+
+def refresh():
+    """Перестраивает индекс и подменяет им старый.
+
+    Сигналы обновляют индекс только в своём процессе; остальные
+    процессы видят чужие изменения после такой перестройки.
+    """
+    global _index
+    if not _refreshing.acquire(blocking=False):
+        return
+    try:
+        _index = PrefixIndex.load()
+    finally:
+        _refreshing.release()
+
+
+def in_background(func):
+    """Запускает func в отдельном потоке со своим соединением с базой."""
+    def run():
+        try:
+            func()
+        finally:
+            connection.close()
+    threading.Thread(target=run, daemon=True).start()
+
+
+def warm():
+    """Строит индекс в фоне при запуске процесса."""
+    in_background(load)
+
+
+def get_index():
+    if _index is None:
+        load()
+    elif (time.monotonic() - _index.loaded_at > settings.AUTOCOMPLETE_REFRESH
+          and not _refreshing.locked()):
+        in_background(refresh)
+    return _index
+
+
+def reset():
+    """Забывает индекс; он построится заново при следующем поиске."""
+    global _index
+    _index = None
+
+
+def label(kind, ref, name):
+    if kind == 'user' and name:
+        return f'{name} ({ref})'
+    return name or ref
+
+
+def search(query, limit=None):
+    """Пользователи и группы, имя которых начинается с query."""
+    found = get_index().search(query, limit or settings.AUTOCOMPLETE_LIMIT)
+    urls = {'user': 'posts:profile', 'group': 'posts:group_list'}
+    return [{
+        'type': kind,
+        'label': label(kind, ref, name),
+        'url': reverse(urls[kind], args=[ref]),
+    } for kind, ref, name in found]
+
+
+def changed(old=None, new=None):
+    """Переносит в индекс процесса правку записи: old - прежняя версия."""
+    if _index is not None:
+        _index.replace(old, new)
@@ -0,0 +1,120 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from core.db import replica_alias
+
+
+def _key(scope, pk):
+    return f'generation:{scope}:{pk}'
+
+
+def _fresh():
+    # Начальное значение берётся из часов, а не с нуля: если счётчик
+    # вытеснят из кеша, новое поколение не совпадёт со старыми ключами.
+    return time.time_ns()
+
+
+def generations(scope, pks):
+    """Текущие поколения данных области scope для каждого из pks."""
+    keys = {_key(scope, pk): pk for pk in pks}
+    found = cache.get_many(keys)
+    missing = {key: _fresh() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def generation(scope, pk):
+    """Текущее поколение данных области scope, например ленты читателя."""
+    return generations(scope, [pk])[pk]
+
+
+def version(*parts):
+    """Версия для ключа кеша из поколений пар (область, pk)."""
+    return '-'.join(
+        f'{scope}.{pk}.{generation(scope, pk)}' for scope, pk in parts)
+
+
+def bump(scope, *pks):
+    """Начинает новое поколение: все ключи со старым становятся мусором."""
+    for pk in pks:
+        try:
+            cache.incr(_key(scope, pk))
+        except ValueError:
+            cache.set(_key(scope, pk), _fresh(), None)
+
+
+def bump_all():
+    """Начинает новое поколение для всех данных разом.
+
+    Поколение, которого нет в кеше, заводится заново из часов, поэтому
+    очистка кеша сбрасывает все страницы без обхода ключей.
+    """
+    cache.clear()
+
+
+def page_ttl():
+    """Срок жизни страницы в кеше.
+
+    Страница, прочитанная с реплики, может отставать от поколения, под
+    которым сохранена, поэтому хранится не дольше REPLICA_LAG.
+    """
+    if replica_alias():
+        return settings.REPLICA_LAG
+    return settings.PAGE_CACHE_TTL
+
+
+def anonymous_page(parts):
+    """Кеширует гостям ответ целиком и отвечает 304 на условный GET.
+
+    parts получает аргументы вью и возвращает пары (область, pk), от
+    которых зависит страница, или None, если объекта нет. Ключ кеша
+    строится из их поколений и адреса страницы, а ETag - из содержимого
+    ответа: страница, прочитанная с отстающей реплики, не получает ETag
+    свежей, и после её истечения клиент получит новую страницу, а не 304.
+    Совпавший If-None-Match получает 304 без рендеринга, пока ответ в кеше.
+    Last-Modified - время, когда ответ был отрисован для этих поколений.
+    Запросы с сессионной кукой идут мимо кеша.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or settings.SESSION_COOKIE_NAME in request.COOKIES):
+                return view(request, *args, **kwargs)
+            depends = parts(*args, **kwargs)
+            if depends is None:
+                return view(request, *args, **kwargs)
+            key = 'page:' + hashlib.md5(
+                f'{version(*depends)}:{request.get_full_path()}'.encode()
+            ).hexdigest()
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if (response.status_code != 200 or response.streaming
+                        or response.cookies
+                        or request.META.get('CSRF_COOKIE_USED')):
+                    return response
+                response['ETag'] = quote_etag(
+                    hashlib.md5(response.content).hexdigest())
+                response['Last-Modified'] = http_date()
+                patch_cache_control(response, max_age=0)
+                patch_vary_headers(response, ('Cookie',))
+                cache.set(key, response, page_ttl())
+            return get_conditional_response(
+                request,
+                etag=response['ETag'],
+                last_modified=parse_http_date_safe(response['Last-Modified']),
+                response=response,
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ArchivedPost, Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def change(model, pk, field, delta):
+    """Атомарно сдвигает счётчик одной строки на delta.
+
+    Уменьшение не опускает счётчик ниже нуля, даже если он разошёлся
+    с данными; точные значения восстанавливает rebuild().
+    """
+    if pk is None:
+        return 0
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    return rows.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    """Сдвигает счётчик пользователя, заводя строку при первом обращении."""
+    if change(UserStats, user_id, field, delta) or delta < 0:
+        return
+    UserStats.objects.get_or_create(user_id=user_id)
+    change(UserStats, user_id, field, delta)
+
+
+def user_stats(user):
+    """Счётчики пользователя; недостающую строку заводит по данным.
+
+    Строки нет у пользователей, записанных без сигналов: через loaddata
+    или bulk_create.
+    """
+    stats = getattr(user, 'stats', None)
+    if stats is None:
+        stats, _ = UserStats.objects.get_or_create(user_id=user.pk, defaults={
+            'posts_count': (
+                Post.objects.filter(author_id=user.pk).count()
+                + ArchivedPost.objects.filter(author_id=user.pk).count()),
+            'followers_count': Follow.objects.filter(
+                author_id=user.pk).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user.pk).count(),
+        })
+        user.stats = stats
+    return stats
+
+
+def _count(model, field, **filters):
+    return Coalesce(Subquery(
+        model.objects.filter(**filters).order_by().values(field).annotate(
+            total=Count('pk')).values('total')), 0)
+
+
+@transaction.atomic
+def rebuild():
+    """Пересчитывает все счётчики по данным."""
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    UserStats.objects.update(
+        posts_count=(
+            _count(Post, 'author', author=OuterRef('pk'))
+            + _count(ArchivedPost, 'author', author=OuterRef('pk'))),
+        followers_count=_count(Follow, 'author', author=OuterRef('pk')),
+        following_count=_count(Follow, 'user', user=OuterRef('pk')),
+    )
+    # Страница группы показывает только горячие посты, без архива.
+    Group.objects.update(
+        posts_count=_count(Post, 'group', group=OuterRef('pk')))
+    Post.objects.update(
+        comments_count=_count(Comment, 'post', post=OuterRef('pk')))
@@ -0,0 +1,162 @@
+import csv
+import json
+import time
+import zipfile
+from itertools import chain
+
+from django.conf import settings
+
+from .importer import FIELDS
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+# Выгрузка в том же формате, что читает import_data: посты и
+# комментарии автора можно загрузить обратно на этот или другой сайт.
+KINDS = ('posts', 'comments')
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'zip': 'application/zip',
+}
+IMAGE_CHUNK = 64 * 1024
+
+
+def author_rows(models, author, *fields):
+    """Строки автора из таблиц models по очереди, каждая в порядке id."""
+    return chain.from_iterable(
+        model.objects.filter(author=author).order_by('pk').values_list(
+            *fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+        for model in models)
+
+
+def post_records(author):
+    posts = author_rows((ArchivedPost, Post), author,
+                        'pk', 'group__slug', 'text', 'pub_date', 'image')
+    for pk, group, text, pub_date, image in posts:
+        yield {
+            'id': pk,
+            'author': author.username,
+            'group': group or '',
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+            'image': image,
+        }
+
+
+def comment_records(author):
+    comments = author_rows((ArchivedComment, Comment), author,
+                           'pk', 'post_id', 'text', 'created')
+    for pk, post_id, text, created in comments:
+        yield {
+            'id': pk,
+            'post': post_id,
+            'author': author.username,
+            'text': text,
+            'created': created.isoformat(),
+        }
+
+
+def records(author, kind):
+    return {'posts': post_records, 'comments': comment_records}[kind](author)
+
+
+class Echo:
+    """Файл, который возвращает записанное вместо того, чтобы копить."""
+
+    def write(self, value):
+        return value
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows, kind):
+    writer = csv.DictWriter(Echo(), FIELDS[kind])
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def lines(author, kind, file_format):
+    """Строки выгрузки вида kind в формате 'jsonl' или 'csv'."""
+    rows = records(author, kind)
+    if file_format == 'csv':
+        return csv_lines(rows, kind)
+    return jsonl_lines(rows)
+
+
+class ZipStream:
+    """Приёмник для ZipFile: отдаёт записанные байты порциями.
+
+    ZipFile пишет в поток без перемотки, поэтому архив можно отдавать
+    по мере записи, не держа его ни в памяти, ни на диске.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        """Записанное с прошлого вызова; пустой список, если ничего."""
+        data, self.chunks = self.chunks, []
+        return [b''.join(data)] if data else []
+
+
+def zip_chunks(author, file_format='jsonl', images=True):
+    """Архив с постами, комментариями и, если images, картинками постов.
+
+    Выгрузки лежат в архиве под именами posts.jsonl и comments.jsonl
+    (или .csv), картинки - под своими именами в хранилище.
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for kind in KINDS:
+            name = f'{kind}.{file_format}'
+            with archive.open(entry_info(name, zipfile.ZIP_DEFLATED), 'w',
+                              force_zip64=True) as entry:
+                for line in lines(author, kind, file_format):
+                    entry.write(line.encode())
+                    yield from stream.take()
+        if images:
+            yield from image_chunks(archive, stream, author)
+    yield from stream.take()
+
+
+def entry_info(name, compress_type):
+    info = zipfile.ZipInfo(name, time.localtime()[:6])
+    info.compress_type = compress_type
+    return info
+
+
+def image_chunks(archive, stream, author):
+    storage = Post._meta.get_field('image').storage
+    hot, archived = (
+        model.objects.filter(author=author).exclude(image='').order_by(
+        ).values_list('image', flat=True)
+        for model in (Post, ArchivedPost))
+    # UNION убирает повторы: одинаковые картинки хранятся одним файлом.
+    for name in hot.union(archived).order_by('image').iterator(
+            chunk_size=settings.EXPORT_CHUNK_SIZE):
+        try:
+            source = storage.open(name)
+        except OSError:
+            continue
+        # Картинки уже сжаты: упаковка только тратила бы процессор.
+        info = entry_info(name, zipfile.ZIP_STORED)
+        with source, archive.open(info, 'w', force_zip64=True) as entry:
+            for chunk in iter(lambda: source.read(IMAGE_CHUNK), b''):
+                entry.write(chunk)
+                yield from stream.take()
@@ -0,0 +1,204 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+
+from . import cache as generations
+from .models import FeedEntry, Follow, Post, UserStats
+from .pagination import Keyset, MergedKeyset
+from .tasks import enqueue, task
+
+FEED_ORDERING = ('-feed_date', '-feed_post')
+PULL_AUTHORS_KEY = 'feeds:pull_authors'
+
+
+def pull_authors():
+    """Авторы, чьи посты читаются при показе ленты, а не раскладываются.
+
+    Это авторы, у которых подписчиков не меньше FEED_PULL_THRESHOLD:
+    раскладывать каждый их пост по десяткам тысяч лент дороже, чем
+    подмешать несколько их постов при чтении. Набор общий для записи
+    и чтения и пересчитывается раз в FEED_PULL_AUTHORS_TTL секунд.
+
+    Принадлежность к набору хранится в UserStats.feed_pulled: автор,
+    у которого подписчиков стало меньше порога, остаётся в наборе, пока
+    задача push_author не разложит его посты по лентам. Иначе посты,
+    написанные им в популярности, пропали бы из лент.
+    """
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        popular = set(popular_authors())
+        flagged = set(UserStats.objects.filter(
+            feed_pulled=True).values_list('user_id', flat=True))
+        mark(popular - flagged, True)
+        for author_id in flagged - popular:
+            enqueue(push_author, author_id=author_id)
+        authors = popular | flagged
+        cache.set(PULL_AUTHORS_KEY, authors, settings.FEED_PULL_AUTHORS_TTL)
+    return authors
+
+
+def popular_authors():
+    """Авторы, у которых подписчиков не меньше FEED_PULL_THRESHOLD."""
+    return Follow.objects.values('author').annotate(
+        followers=Count('pk'),
+    ).filter(
+        followers__gte=settings.FEED_PULL_THRESHOLD,
+    ).values_list('author', flat=True)
+
+
+def mark(authors, pulled):
+    """Записывает авторам признак feed_pulled."""
+    if not authors:
+        return
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in authors), ignore_conflicts=True)
+    UserStats.objects.filter(user_id__in=authors).update(feed_pulled=pulled)
+
+
+def pulled_authors(user):
+    """Популярные авторы, на которых подписан читатель."""
+    popular = pull_authors()
+    if not popular:
+        return []
+    return list(Follow.objects.filter(
+        user=user, author__in=popular).values_list('author', flat=True))
+
+
+def follow_feed(user):
+    """Лента подписок читателя.
+
+    Посты обычных авторов берутся из материализованной ленты одним
+    диапазоном по индексу (user, pub_date, post); поля ленты
+    подмешиваются через annotate, чтобы сортировка и курсор шли по ним.
+    Посты популярных авторов читаются напрямую и сливаются с лентой
+    по дате публикации.
+    """
+    pushed = Keyset(
+        Post.objects.filter(feed_entries__user=user).annotate(
+            feed_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post'),
+        ).select_related('author', 'group'),
+        FEED_ORDERING,
+        fields=('pub_date', 'pk'),
+    )
+    authors = pulled_authors(user)
+    if not authors:
+        return pushed
+    # По автору отдельно: каждый читается диапазоном индекса
+    # (author, pub_date), а author IN (...) SQLite пришлось бы сортировать.
+    pulled = (
+        Keyset(Post.objects.filter(author_id=author).select_related(
+            'author', 'group'))
+        for author in authors
+    )
+    return MergedKeyset(pushed, *pulled)
+
+
+def feed_version(user):
+    """Версия ленты читателя для ключей кеша.
+
+    Меняется, когда пишет автор из подписок или меняются сами подписки:
+    разложенная часть ленты версионируется целиком, подмешанная - по
+    поколениям её популярных авторов.
+    """
+    parts = [user.pk, generations.generation('feed', user.pk)]
+    authors = generations.generations('author', pulled_authors(user))
+    parts.extend(f'{pk}.{value}' for pk, value in sorted(authors.items()))
+    return '-'.join(map(str, parts))
+
+
+def invalidate(author_id):
+    """Сбрасывает кеш лент, в которые попадают посты автора."""
+    generations.bump('author', author_id)
+    if author_id in pull_authors():
+        return
+    generations.bump('feed', *Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True))
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in pull_authors():
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя последние посты нового автора."""
+    if author_id in pull_authors():
+        return
+    fill(user_id, author_id)
+
+
+def fill(user_id, author_id):
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date').values_list('pk', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts[:settings.FEED_BACKFILL_LIMIT]),
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+@task
+def push_author(author_id):
+    """Возвращает автору раскладку постов, когда он ушёл из популярных.
+
+    Сначала посты раскладываются по лентам подписчиков, и только потом
+    снимается feed_pulled: до этого ленты подмешивают посты автора при
+    чтении. Подписки и посты, появившиеся за время раскладки,
+    дописываются после.
+    """
+    followers = Follow.objects.filter(author_id=author_id)
+    if followers.count() >= settings.FEED_PULL_THRESHOLD:
+        return
+    last_follow = followers.aggregate(last=Max('pk'))['last'] or 0
+    last_post = Post.objects.filter(author_id=author_id).aggregate(
+        last=Max('pk'))['last'] or 0
+    for user_id in followers.filter(pk__lte=last_follow).values_list(
+            'user_id', flat=True).iterator():
+        fill(user_id, author_id)
+    mark({author_id}, False)
+    cache.delete(PULL_AUTHORS_KEY)
+    for user_id in followers.filter(pk__gt=last_follow).values_list(
+            'user_id', flat=True):
+        fill(user_id, author_id)
+    for post in Post.objects.filter(author_id=author_id, pk__gt=last_post):
+        fan_out(post)
+    invalidate(author_id)
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def refresh():
+    """Пересчитывает набор популярных авторов при следующем обращении.
+
+    Нужно после подписок, записанных без сигналов: иначе набор
+    отстанет от них на FEED_PULL_AUTHORS_TTL.
+    """
+    cache.delete(PULL_AUTHORS_KEY)
+
+
+def fill_authors(author_ids):
+    """Дописывает последние посты авторов в ленты их подписчиков.
+
+    Ленты не очищаются, повторы отбрасывает ignore_conflicts, поэтому
+    во время дозаписи читатели видят свои ленты целиком.
+    """
+    follows = Follow.objects.filter(
+        author_id__in=set(author_ids) - pull_authors(),
+    ).values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        fill(user_id, author_id)
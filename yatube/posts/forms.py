@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.forms import ModelForm
+from django.template.defaultfilters import filesizeformat
 
 from .models import Comment, Post
 
@@ -14,6 +16,23 @@ class PostForm(ModelForm):
                       }
         fields = ["text", "group", "image"]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Слишком большой файл обработчик загрузки не сохраняет;
+        # поле не должно принять его за пустую картинку.
+        self.image_oversized = getattr(
+            self.files.get('image'), 'oversized', False)
+        if self.image_oversized:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.image_oversized:
+            limit = filesizeformat(settings.UPLOAD_MAX_SIZE)
+            self.add_error('image', f'Картинка больше {limit}.')
+        return cleaned_data
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,267 @@
+import contextlib
+import csv
+import json
+import os
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import autocomplete, counters, feeds, search, thumbnails
+from .cache import bump_all
+from .models import ArchivedPost, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Поля записей: JSONL - объект на строку, CSV - столбцы с теми же именами.
+# Авторы и читатели указываются по username, группа - по slug. id поста
+# необязателен: с ним пост получает этот id, и комментарии из той же
+# выгрузки ссылаются на посты по их id (поле post).
+FIELDS = {
+    'posts': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comments': ('id', 'post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+
+
+class ImportFailed(ValueError):
+    """Запись не удалось разобрать."""
+
+
+def file_format(path, name=None):
+    """Формат файла: name или расширение, 'jsonl' либо 'csv'."""
+    name = (name or os.path.splitext(path)[1].lstrip('.')).lower()
+    if name not in FORMATS:
+        raise ImportFailed(f'Неизвестный формат файла: {name}.')
+    return FORMATS[name]
+
+
+def read_jsonl(file_):
+    for line in file_:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+FORMATS = {'jsonl': read_jsonl, 'json': read_jsonl, 'csv': csv.DictReader}
+
+
+def read(path, name=None):
+    """Поток записей файла: словари с полями из FIELDS.
+
+    Файл читается построчно, поэтому его размер не ограничен памятью.
+    Строка JSONL, которую не удалось разобрать, даёт None.
+    """
+    reader = file_format(path, name)
+    with open(path, encoding='utf-8', newline='') as file_:
+        yield from reader(file_)
+
+
+@contextlib.contextmanager
+def original_dates():
+    """Сохраняет даты из файла: bulk_create иначе подставит текущие."""
+    fields = [Post._meta.get_field('pub_date'),
+              Comment._meta.get_field('created')]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def moment(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ImportFailed(f'Не дата: {value}.')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+# Сколько пропущенных записей показать с причиной.
+SKIPPED_SHOWN = 20
+
+
+class Importer:
+    """Пишет записи пачками через bulk_create, пачку - в одной транзакции.
+
+    Пользователи и группы ищутся по словарям username -> id и
+    slug -> id в памяти; тех, кого нет на сайте, импорт создаёт
+    (пользователей - без пароля). Сигналы при bulk_create не
+    срабатывают: поиск и ленты по новым подпискам дописываются в
+    транзакции каждой пачки, а счётчики, ленты по новым постам и кеш -
+    один раз в finish(). Комментарии ни ленты, ни поиска не трогают.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.skipped = 0
+        self.problems = []
+        # Авторы новых постов и признак новых подписок для finish().
+        self.authors = set()
+        self.followed = False
+
+    def run(self, kind, records, source=''):
+        """Импортирует поток записей вида kind из FIELDS.
+
+        source - имя файла для сообщений о пропущенных записях.
+        """
+        self.source, self.processed = source, 0
+        build = getattr(self, f'build_{kind}')
+        records = iter(enumerate(records, 1))
+        with original_dates():
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    return
+                with transaction.atomic():
+                    self.write(kind, build, batch)
+                self.processed += len(batch)
+
+    def skip(self, number, reason):
+        self.skipped += 1
+        if len(self.problems) < SKIPPED_SHOWN:
+            self.problems.append((f'{self.source}:{number}', reason))
+
+    def write(self, kind, build, batch):
+        rows = [row for _, row in batch if row]
+        self.resolve_users(row.get(field) for row in rows
+                           for field in ('author', 'user'))
+        self.resolve_groups(row.get('group') for row in rows)
+        objects = []
+        for number, row in batch:
+            try:
+                instance = build(row or {})
+            except KeyError as error:
+                self.skip(number, f'Нет поля или значения {error}.')
+            except (ImportFailed, ValueError) as error:
+                self.skip(number, str(error))
+            else:
+                if instance is not None:
+                    objects.append((number, instance))
+        known = {'posts': self.new_posts, 'comments': self.existing_posts}
+        if kind in known:
+            objects = known[kind](objects)
+        objects = [instance for _, instance in objects]
+        if objects:
+            self.save(kind, objects)
+
+    def save(self, kind, objects):
+        """Пишет пачку и дописывает то, что сделали бы её сигналы."""
+        model = type(objects[0])
+        # Посты без id получают id больше прежнего наибольшего.
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        model.objects.bulk_create(objects, ignore_conflicts=True)
+        saved = getattr(self, f'saved_{kind}', None)
+        if saved is not None:
+            saved(objects, last)
+
+    def saved_posts(self, posts, last):
+        search.index_many(Post.objects.filter(
+            Q(pk__gt=last) | Q(pk__in={post.pk for post in posts if post.pk})))
+        for post in posts:
+            thumbnails.schedule(post.image)
+        self.authors.update(post.author_id for post in posts)
+
+    def saved_follows(self, follows, last):
+        for follow in follows:
+            feeds.backfill(follow.user_id, follow.author_id)
+        self.followed = True
+
+    def resolve_users(self, usernames):
+        """Заводит пользователей, которых ещё нет в словаре."""
+        missing = {name for name in usernames
+                   if name and name not in self.users}
+        if not missing:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            (User(username=name, password=password) for name in missing),
+            ignore_conflicts=True)
+        self.users.update(User.objects.filter(
+            username__in=missing).values_list('username', 'pk'))
+
+    def resolve_groups(self, slugs):
+        missing = {slug for slug in slugs if slug and slug not in self.groups}
+        if not missing:
+            return
+        Group.objects.bulk_create(
+            (Group(slug=slug, title=slug) for slug in missing),
+            ignore_conflicts=True)
+        self.groups.update(Group.objects.filter(
+            slug__in=missing).values_list('slug', 'pk'))
+
+    def build_posts(self, row):
+        if not row['text']:
+            raise ImportFailed('Пустой текст.')
+        post = Post(
+            id=row.get('id') or None,
+            author_id=self.users[row['author']],
+            group_id=self.groups.get(row.get('group')),
+            text=row['text'],
+            pub_date=moment(row.get('pub_date')),
+            image=row.get('image') or '',
+        )
+        thumbnails.describe(post)
+        return post
+
+    def build_comments(self, row):
+        if not row['text']:
+            raise ImportFailed('Пустой текст.')
+        return Comment(
+            id=row.get('id') or None,
+            post_id=int(row['post']),
+            author_id=self.users[row['author']],
+            text=row['text'],
+            created=moment(row.get('created')),
+        )
+
+    def build_follows(self, row):
+        user, author = self.users[row['user']], self.users[row['author']]
+        if user == author:
+            return None
+        return Follow(user_id=user, author_id=author)
+
+    def new_posts(self, posts):
+        """Отбрасывает посты, которые уже перенесены в архив."""
+        archived = set(ArchivedPost.objects.filter(
+            pk__in={post.pk for _, post in posts if post.pk},
+        ).values_list('pk', flat=True))
+        for number, post in posts:
+            if post.pk in archived:
+                self.skip(number, f'Пост {post.pk} уже в архиве.')
+        return [(number, post) for number, post in posts
+                if post.pk not in archived]
+
+    def existing_posts(self, comments):
+        """Отбрасывает комментарии к постам, которых нет на сайте."""
+        found = set(Post.objects.filter(
+            pk__in={comment.post_id for _, comment in comments},
+        ).values_list('pk', flat=True))
+        for number, comment in comments:
+            if comment.post_id not in found:
+                self.skip(number, f'Нет поста {comment.post_id}.')
+        return [(number, comment) for number, comment in comments
+                if comment.post_id in found]
+
+    def finish(self):
+        """Пересчитывает то, что сигналы поддерживают при записи по одной."""
+        counters.rebuild()
+        if self.followed:
+            feeds.refresh()
+        if self.authors:
+            feeds.fill_authors(self.authors)
+        autocomplete.reset()
+        bump_all()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import archive
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые посты с комментариями в архив.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Возраст поста в днях; по умолчанию ARCHIVE_AFTER_DAYS.')
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Постов в одной транзакции; по умолчанию '
+                 'ARCHIVE_BATCH_SIZE.')
+
+    def handle(self, *args, **options):
+        moved = archive.archive(
+            archive.cutoff(options['days']), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'В архив перенесено: {moved}.'))
@@ -0,0 +1,46 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты или комментарии пользователя в JSONL, CSV или zip.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--kind', choices=exporter.KINDS, default='posts',
+            help='Что выгружать, кроме zip: там и посты, и комментарии.')
+        parser.add_argument(
+            '--format', choices=[*exporter.FORMATS, 'zip'], default='jsonl')
+        parser.add_argument(
+            '--no-images', action='store_true',
+            help='Не класть в zip картинки постов.')
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию stdout.')
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(username=options['username']).first()
+        if author is None:
+            raise CommandError(f'Нет пользователя {options["username"]}.')
+        if options['format'] == 'zip':
+            if not options['output']:
+                raise CommandError('Архив пишется только в файл: --output.')
+            chunks = exporter.zip_chunks(
+                author, images=not options['no_images'])
+        else:
+            chunks = (line.encode() for line in exporter.lines(
+                author, options['kind'], options['format']))
+        output = (open(options['output'], 'wb') if options['output']
+                  else sys.stdout.buffer)
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+from posts.models import Comment, Follow, Post
+
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты, комментарии или подписки из JSONL или CSV '
+            'пачками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(importer.FIELDS))
+        parser.add_argument('paths', nargs='+', metavar='path')
+        parser.add_argument(
+            '--format', choices=list(importer.FORMATS),
+            help='Формат файлов; по умолчанию по расширению.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Записей в одной пачке и транзакции.')
+
+    def handle(self, *args, **options):
+        kind, model = options['kind'], MODELS[options['kind']]
+        try:
+            for path in options['paths']:
+                importer.file_format(path, options['format'])
+        except importer.ImportFailed as error:
+            raise CommandError(error)
+        job = importer.Importer(options['batch_size'])
+        before = model.objects.count()
+        for path in options['paths']:
+            job.run(kind, importer.read(path, options['format']), path)
+            self.stdout.write(f'{path}: прочитано записей {job.processed}')
+        job.finish()
+        for place, reason in job.problems:
+            self.stderr.write(f'{place}: {reason}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено: {model.objects.count() - before}, '
+            f'пропущено: {job.skipped}.'))
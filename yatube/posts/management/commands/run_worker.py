@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.')
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.')
+
+    def handle(self, *args, **options):
+        while True:
+            done = tasks.run_pending()
+            if done:
+                self.stdout.write(f'Выполнено задач: {done}')
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    # Как и feeds.backfill: не больше FEED_BACKFILL_LIMIT последних
+    # постов автора на подписку.
+    for follow in Follow.objects.iterator():
+        posts = Post.objects.filter(author_id=follow.author_id).order_by(
+            '-pub_date').values_list('pk', 'pub_date')
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=follow.user_id, post_id=pk, pub_date=pub_date)
+             for pk, pub_date in posts[:settings.FEED_BACKFILL_LIMIT]),
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_auto_20221021_1909'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='feed_range_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
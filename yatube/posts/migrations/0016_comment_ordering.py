@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['created', 'pk'], 'verbose_name': 'Комментарий', 'verbose_name_plural': 'Комментарии'},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+    ]
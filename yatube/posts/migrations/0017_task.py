@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_comment_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Задача')),
+                ('key', models.CharField(help_text='Повторная постановка той же задачи не создаёт новую', max_length=255, unique=True, verbose_name='Ключ')),
+                ('payload', models.TextField(default='{}', verbose_name='Параметры в JSON')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Поставлена')),
+                ('run_after', models.DateTimeField(blank=True, null=True, verbose_name='Не раньше')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
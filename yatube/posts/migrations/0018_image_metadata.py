@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:38
+
+import json
+
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def describe_images(apps, schema_editor):
+    """Размеры и вес уже загруженных картинок; превью - в очередь."""
+    Post = apps.get_model('posts', 'Post')
+    Task = apps.get_model('posts', 'Task')
+    names = set()
+    for post in Post.objects.exclude(image='').iterator():
+        try:
+            with default_storage.open(post.image.name) as file_:
+                width, height = get_image_dimensions(file_)
+            size = default_storage.size(post.image.name)
+        except OSError:
+            continue
+        Post.objects.filter(pk=post.pk).update(
+            image_width=width, image_height=height, image_size=size)
+        names.add(post.image.name)
+    name = 'posts.thumbnails.make_thumbnails'
+    Task.objects.bulk_create((
+        Task(name=name, key=f'{name}:{json.dumps(params, sort_keys=True)}',
+             payload=json.dumps(params))
+        for params in ({'name': image} for image in sorted(names))
+    ), batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Крошечная копия кадра в виде data: URI', verbose_name='Превью картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Размер картинки, байт'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(describe_images, migrations.RunPython.noop),
+    ]
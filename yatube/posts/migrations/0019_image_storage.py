@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:43
+
+from django.db import migrations, models
+import posts.uploads
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.uploads.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from posts.stemmer import stems
+
+
+def index_posts(apps, schema_editor):
+    """Заносит в поисковый индекс уже написанные посты."""
+    Post = apps.get_model('posts', 'Post')
+    rows = (
+        (pk, ' '.join(stems(text)))
+        for pk, text in Post.objects.values_list('pk', 'text').iterator()
+    )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO posts_post_fts (rowid, text) VALUES (%s, %s)', rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+            "text, tokenize = 'unicode61 remove_diacritics 2')",
+            'DROP TABLE posts_post_fts',
+        ),
+        migrations.RunPython(index_posts, migrations.RunPython.noop),
+    ]
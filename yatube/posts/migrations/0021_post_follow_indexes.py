@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Min
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    """Оставляет по одной подписке на пару читатель-автор."""
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        copies=Count('pk'), first=Min('pk')).filter(copies__gt=1)
+    for row in duplicates:
+        Follow.objects.filter(user=row['user'], author=row['author']).exclude(
+            pk=row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            drop_duplicate_follows, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='follow',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='group',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Группа, к которой будет относиться пост', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posts', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='post_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='post_author_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
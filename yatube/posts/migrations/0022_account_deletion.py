@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0021_post_follow_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=150, verbose_name='Имя пользователя')),
+                ('requested', models.DateTimeField(auto_now_add=True, verbose_name='Запрошено')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('step', models.CharField(blank=True, max_length=20, verbose_name='Текущий шаг')),
+                ('total', models.PositiveIntegerField(default=0, help_text='Посты, комментарии, подписки и лента на момент запроса', verbose_name='Записей к удалению')),
+                ('deleted', models.PositiveIntegerField(default=0, verbose_name='Удалено записей')),
+                ('files_deleted', models.PositiveIntegerField(default=0, verbose_name='Удалено файлов')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Удаление аккаунта',
+                'verbose_name_plural': 'Удаления аккаунтов',
+                'ordering': ['-requested'],
+            },
+        ),
+    ]
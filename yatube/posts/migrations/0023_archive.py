@@ -0,0 +1,61 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.uploads
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0022_account_deletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Текст поста')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('image', models.ImageField(blank=True, storage=posts.uploads.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка')),
+                ('image_width', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ширина картинки')),
+                ('image_height', models.PositiveIntegerField(blank=True, null=True, verbose_name='Высота картинки')),
+                ('image_size', models.PositiveIntegerField(blank=True, null=True, verbose_name='Размер картинки, байт')),
+                ('image_placeholder', models.TextField(blank=True, verbose_name='Превью картинки')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Количество комментариев')),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_posts', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Архивный пост',
+                'verbose_name_plural': 'Архивные посты',
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Текст комментария')),
+                ('created', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.ArchivedPost', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Архивный комментарий',
+                'verbose_name_plural': 'Архивные комментарии',
+                'ordering': ['created', 'pk'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(fields=['author', 'pub_date'], name='archived_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcomment',
+            index=models.Index(fields=['post', 'created'], name='archived_comment_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, help_text='Посты автора не раскладываются по лентам подписчиков', verbose_name='Посты подмешиваются в ленты при чтении'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .uploads import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -13,6 +15,10 @@ class Group(models.Model):
         verbose_name='Адрес группы')
     description = models.TextField(
         verbose_name='Описание группы')
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False)
 
     class Meta:
         verbose_name = 'Группа'
@@ -36,12 +42,14 @@ class Post(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Автор',
         related_name='posts',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться пост',
         related_name='posts',
@@ -49,13 +57,49 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False)
+    image_size = models.PositiveIntegerField(
+        'Размер картинки, байт',
+        null=True,
+        blank=True,
+        editable=False)
+    image_placeholder = models.TextField(
+        'Превью картинки',
+        help_text='Крошечная копия кадра в виде data: URI',
+        blank=True,
+        editable=False)
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False)
+
+    archived = False
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Страницы группы и автора выбирают посты по группе или автору
+        # в порядке даты: индекс отдаёт их уже отсортированными, а
+        # отдельные индексы по внешним ключам становятся лишними.
+        indexes = [
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -83,8 +127,13 @@ class Comment(models.Model):
         auto_now_add=True)
 
     class Meta:
+        ordering = ['created', 'pk']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -96,6 +145,7 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Подписчик',
         related_name='follower',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -107,3 +157,213 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписчик'
         verbose_name_plural = 'Подписчики'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Пост в материализованной ленте подписок читателя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Читатель',
+        related_name='feed',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date', 'post'], name='feed_range_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user} <- {self.post}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые показываются на страницах."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Пользователь',
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0)
+    following_count = models.PositiveIntegerField(
+        'Количество подписок', default=0)
+    feed_pulled = models.BooleanField(
+        'Посты подмешиваются в ленты при чтении',
+        default=False,
+        help_text='Посты автора не раскладываются по лентам подписчиков')
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self) -> str:
+        return f'{self.user}'
+
+
+class Task(models.Model):
+    """Задача для фонового обработчика (manage.py run_worker)."""
+    name = models.CharField('Задача', max_length=100)
+    key = models.CharField(
+        'Ключ',
+        max_length=255,
+        unique=True,
+        help_text='Повторная постановка той же задачи не создаёт новую')
+    payload = models.TextField('Параметры в JSON', default='{}')
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+    run_after = models.DateTimeField('Не раньше', null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self) -> str:
+        return self.key
+
+
+class AccountDeletion(models.Model):
+    """Удаление пользователя и его записей фоновыми порциями."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Пользователь',
+        related_name='+',
+    )
+    username = models.CharField('Имя пользователя', max_length=150)
+    requested = models.DateTimeField('Запрошено', auto_now_add=True)
+    finished = models.DateTimeField('Завершено', null=True, blank=True)
+    step = models.CharField('Текущий шаг', max_length=20, blank=True)
+    total = models.PositiveIntegerField(
+        'Записей к удалению', default=0,
+        help_text='Посты, комментарии, подписки и лента на момент запроса')
+    deleted = models.PositiveIntegerField('Удалено записей', default=0)
+    files_deleted = models.PositiveIntegerField('Удалено файлов', default=0)
+
+    class Meta:
+        ordering = ['-requested']
+        verbose_name = 'Удаление аккаунта'
+        verbose_name_plural = 'Удаления аккаунтов'
+
+    def __str__(self) -> str:
+        return self.username
+
+    @property
+    def progress(self):
+        """Доля удалённых записей, от 0 до 1."""
+        if self.finished:
+            return 1.0
+        return min(self.deleted / self.total, 1.0) if self.total else 0.0
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесённый из posts_post командой archive_posts.
+
+    id сохраняется прежним, поэтому ссылки на пост продолжают работать.
+    Архивный пост только читается: правка и комментарии недоступны.
+    """
+    text = models.TextField('Текст поста')
+    pub_date = models.DateTimeField('Дата публикации')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='archived_posts',
+        db_index=False,
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        verbose_name='Группа',
+        related_name='archived_posts',
+    )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        storage=ContentAddressedStorage(),
+        blank=True
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True)
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True)
+    image_size = models.PositiveIntegerField(
+        'Размер картинки, байт', null=True, blank=True)
+    image_placeholder = models.TextField('Превью картинки', blank=True)
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0)
+
+    archived = True
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Архивный пост'
+        verbose_name_plural = 'Архивные посты'
+        indexes = [
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='archived_author_date_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return self.text[:15]
+
+
+class ArchivedComment(models.Model):
+    """Комментарий к архивному посту."""
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='comments',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='archived_comments',
+    )
+    text = models.TextField('Текст комментария')
+    created = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['created', 'pk']
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='archived_comment_created_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return self.text[:15]
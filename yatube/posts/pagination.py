@@ -0,0 +1,211 @@
+import datetime as dt
+import heapq
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import QuerySet
+from django.utils import timezone
+
+POST_ORDERING = ('-pub_date', '-pk')
+COMMENT_ORDERING = ('created', 'pk')
+EPOCH = dt.datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = dt.timedelta(microseconds=1)
+
+
+def encode_cursor(moment, pk):
+    """Упаковывает ключ (дата, id) в строку для параметров URL."""
+    return f'{(moment - EPOCH) // MICROSECOND}_{pk}'
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор; для испорченного значения возвращает None."""
+    try:
+        micros, pk = cursor.split('_')
+        return EPOCH + dt.timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+class CursorPage(Page):
+    """Страница, полученная по курсору.
+
+    Номера у неё нет: наличие соседних страниц определяется при выборке,
+    а не через COUNT(*).
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+def page_window(page, on_each_side=2, on_ends=1):
+    """Номера страниц для ссылок: края и окрестность текущей.
+
+    Пропуски обозначаются None, поэтому ссылок не больше
+    2 * (on_each_side + on_ends) + 3 при любом числе страниц.
+    У страницы по курсору номера нет, и список пуст.
+    """
+    if page.number is None:
+        return []
+    last = page.paginator.num_pages
+    shown = sorted({
+        *range(1, min(on_ends, last) + 1),
+        *range(max(last - on_ends + 1, 1), last + 1),
+        *range(max(page.number - on_each_side, 1),
+               min(page.number + on_each_side, last) + 1),
+    })
+    window = []
+    for number in shown:
+        if window and number - window[-1] == 2:
+            window.append(number - 1)
+        elif window and number - window[-1] > 2:
+            window.append(None)
+        window.append(number)
+    return window
+
+
+class Keyset:
+    """Выборка, упорядоченная по ключу (дата, id).
+
+    ordering задаёт поля сортировки в запросе, fields - атрибуты
+    объекта, из которых собирается курсор. Число строк для номерных
+    страниц считается по самой выборке: денормализованные счётчики
+    могут отставать и годятся только для показа.
+    """
+
+    def __init__(self, queryset, ordering=POST_ORDERING, fields=None):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = ordering
+        self.fields = fields or tuple(name.lstrip('-') for name in ordering)
+        self.descending = ordering[0].startswith('-')
+
+    def key(self, obj):
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def cursor(self, obj):
+        return encode_cursor(*self.key(obj))
+
+    def parse(self, value):
+        return decode_cursor(value)
+
+    def count(self):
+        return self.queryset.count()
+
+    def __getitem__(self, index):
+        return self.queryset[index]
+
+    def window(self, cursor, backwards=False):
+        descending = self.descending != backwards
+        date_field, pk_field = (name.lstrip('-') for name in self.ordering)
+        sign = '-' if descending else ''
+        queryset = self.queryset.order_by(sign + date_field, sign + pk_field)
+        if cursor is None:
+            return queryset
+        moment, pk = cursor
+        # Условие записано как диапазон по дате минус «хвост» с той же
+        # датой: так SQLite читает индекс по дате, а не весь OR.
+        edge, beyond = ('lte', 'gte') if descending else ('gte', 'lte')
+        return queryset.filter(**{f'{date_field}__{edge}': moment}).exclude(
+            **{date_field: moment, f'{pk_field}__{beyond}': pk})
+
+    def fetch(self, cursor, backwards, limit):
+        return list(self.window(cursor, backwards)[:limit])
+
+
+class MergedKeyset:
+    """Несколько выборок с общим ключом, слитые в одну ленту.
+
+    Каждая часть читается своим диапазоном по индексу, результаты
+    сливаются по ключу, повторы одного объекта отбрасываются.
+    """
+
+    def __init__(self, *parts):
+        self.parts = parts
+        self.key = parts[0].key
+        self.cursor = parts[0].cursor
+        self.parse = parts[0].parse
+        self.descending = parts[0].descending
+
+    def count(self):
+        return sum(part.count() for part in self.parts)
+
+    def __getitem__(self, index):
+        return self.fetch(None, False, index.stop)[index]
+
+    def fetch(self, cursor, backwards, limit):
+        merged = heapq.merge(
+            *(part.fetch(cursor, backwards, limit) for part in self.parts),
+            key=self.key,
+            reverse=self.descending != backwards,
+        )
+        rows, seen = [], set()
+        for obj in merged:
+            if obj.pk not in seen:
+                seen.add(obj.pk)
+                rows.append(obj)
+            if len(rows) == limit:
+                break
+        return rows
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (дата, id).
+
+    Номерные страницы работают как у обычного Paginator, а страницы
+    после или перед курсором читаются диапазоном по индексу без
+    COUNT(*) и OFFSET, поэтому стоят одинаково на любой глубине.
+    Курсор собирает и разбирает сама выборка: cursor() и parse().
+    """
+
+    def cursor_for(self, obj):
+        return self.object_list.cursor(obj)
+
+    def with_cursors(self, page):
+        """Добавляет странице курсоры для ссылок на соседние страницы."""
+        page.next_cursor = page.previous_cursor = None
+        if not len(page):
+            return page
+        if page.has_next():
+            page.next_cursor = self.cursor_for(page[len(page) - 1])
+        if page.has_previous():
+            page.previous_cursor = self.cursor_for(page[0])
+        return page
+
+    def page(self, number):
+        return self.with_cursors(super().page(number))
+
+    def seek(self, after=None, before=None):
+        """Страница сразу после курсора after или перед курсором before."""
+        backwards = before is not None
+        cursor = self.object_list.parse(before if backwards else after)
+        if cursor is None:
+            return self.page(1)
+        rows = self.object_list.fetch(cursor, backwards, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not backwards:
+            return self.with_cursors(CursorPage(rows, self, has_more, True))
+        if not has_more:
+            return self.page(1)
+        rows.reverse()
+        return self.with_cursors(CursorPage(rows, self, True, True))
+
+
+def paginate(object_list, request, per_page=None):
+    """Выбирает страницу по ?page=, ?after= или ?before=."""
+    if isinstance(object_list, QuerySet):
+        object_list = Keyset(object_list)
+    paginator = CursorPaginator(
+        object_list, per_page or settings.POSTS_LIMIT)
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if after or before:
+        return paginator.seek(after=after or None, before=before or None)
+    return paginator.get_page(request.GET.get('page'))
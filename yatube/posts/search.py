@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.functional import cached_property
+
+from .models import Post
+from .stemmer import stems
+
+# Виртуальная таблица FTS5: rowid совпадает с id поста, в text лежат
+# основы слов, поэтому запрос «котами» находит и «кот», и «коты».
+TABLE = 'posts_post_fts'
+BATCH_SIZE = 2000
+
+
+def document(text):
+    return ' '.join(stems(text))
+
+
+def match_query(query):
+    """Запрос FTS5: все основы слов из query, каждая в кавычках."""
+    return ' '.join(f'"{word}"' for word in stems(query))
+
+
+def index(post):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, document(post.text)],
+        )
+
+
+def unindex(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+
+
+def index_many(posts):
+    """Индексирует выборку постов пачками по BATCH_SIZE."""
+    rows = posts.values_list('pk', 'text').order_by().iterator(
+        chunk_size=BATCH_SIZE)
+    sql = f'INSERT OR REPLACE INTO {TABLE} (rowid, text) VALUES (%s, %s)'
+    with connection.cursor() as cursor:
+        batch = []
+        for pk, text in rows:
+            batch.append((pk, document(text)))
+            if len(batch) == BATCH_SIZE:
+                cursor.executemany(sql, batch)
+                batch = []
+        cursor.executemany(sql, batch)
+
+
+@transaction.atomic
+def rebuild():
+    """Заново заполняет индекс по всем постам."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    index_many(Post.objects.all())
+
+
+def filter_posts(queryset, query):
+    """Оставляет в выборке постов только подходящие под запрос."""
+    # pk__in=RawSQL(...) дало бы IN ((SELECT ...)), а это для SQLite
+    # скалярный подзапрос с одной строкой.
+    return queryset.extra(
+        where=[f'{Post._meta.db_table}.id IN '
+               f'(SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)'],
+        params=[match_query(query)],
+    )
+
+
+class SearchResults:
+    """Посты по запросу, упорядоченные по bm25, для CursorPaginator.
+
+    Ключ страницы - (оценка, id): следующая страница читается условием
+    на этот ключ, а не OFFSET. Сами посты добираются одним in_bulk.
+    Ранжируются только SEARCH_MAX_RESULTS самых новых совпадений:
+    bm25 считается для каждой найденной строки, и без предела запрос
+    по частому слову стоил бы пропорционально размеру базы.
+    """
+
+    def __init__(self, query, queryset=None):
+        self.match = match_query(query)
+        self.queryset = Post.objects.all() if queryset is None else queryset
+        self.descending = False
+
+    def key(self, obj):
+        return (obj.search_rank, obj.pk)
+
+    def cursor(self, obj):
+        return f'{obj.search_rank!r}_{obj.pk}'
+
+    def parse(self, value):
+        try:
+            rank, pk = value.split('_')
+            return float(rank), int(pk)
+        except (AttributeError, ValueError):
+            return None
+
+    @cached_property
+    def floor(self):
+        """Наименьший id среди ранжируемых совпадений."""
+        # FTS5 отдаёт совпадения в порядке rowid, поэтому граница
+        # находится проходом по списку документов без подсчёта bm25.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'ORDER BY rowid DESC LIMIT 1 OFFSET %s',
+                [self.match, settings.SEARCH_MAX_RESULTS - 1])
+            row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s AND rowid >= %s',
+                [self.match, self.floor])
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, index):
+        return self.select('', [], index.stop - index.start, index.start)
+
+    def fetch(self, cursor, backwards, limit):
+        if cursor is None:
+            return self.select('', [], limit, backwards=backwards)
+        sign = '<' if backwards else '>'
+        return self.select(f'AND (bm25({TABLE}), rowid) {sign} (%s, %s)',
+                           list(cursor), limit, backwards=backwards)
+
+    def select(self, condition, params, limit, offset=0, backwards=False):
+        if not self.match or limit <= 0:
+            return []
+        order = 'DESC' if backwards else 'ASC'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({TABLE}) AS score FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s AND rowid >= %s {condition} '
+                f'ORDER BY score {order}, rowid {order} LIMIT %s OFFSET %s',
+                [self.match, self.floor, *params, limit, offset],
+            )
+            ranks = cursor.fetchall()
+        posts = self.queryset.in_bulk([pk for pk, _ in ranks])
+        found = []
+        for pk, rank in ranks:
+            if pk in posts:
+                posts[pk].search_rank = rank
+                found.append(posts[pk])
+        return found
@@ -0,0 +1,202 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, counters, feeds, search, thumbnails
+from .cache import bump
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Group, Post, UserStats,
+)
+
+User = get_user_model()
+NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def post_changed(post):
+    """Сбрасывает поколения всех страниц, где виден пост."""
+    bump('global', 0)
+    bump('post', post.pk)
+    groups = {post.group_id, getattr(post, '_saved_group_id', None)}
+    bump('group', *(pk for pk in groups if pk is not None))
+    feeds.invalidate(post.author_id)
+
+
+def follow_changed(follow):
+    """Сбрасывает ленту читателя и страницы обоих: там видны счётчики."""
+    bump('feed', follow.user_id)
+    bump('author', follow.author_id, follow.user_id)
+
+
+def distinct(queryset, field):
+    """Различные непустые значения поля в выборке."""
+    return set(queryset.exclude(**{field: None}).order_by().values_list(
+        field, flat=True).distinct())
+
+
+def group_renamed(group_id):
+    """Сбрасывает страницы постов группы и их авторов: там её название."""
+    for model in (Post, ArchivedPost):
+        posts = model.objects.filter(group_id=group_id)
+        bump('post', *distinct(posts, 'pk'))
+        for author_id in distinct(posts, 'author_id'):
+            feeds.invalidate(author_id)
+
+
+def user_renamed(user_id):
+    """Сбрасывает страницы, где видно имя пользователя.
+
+    Это его посты в общей ленте, группах и лентах подписчиков, а также
+    страницы постов с его комментариями.
+    """
+    bump('global', 0)
+    feeds.invalidate(user_id)
+    for posts, comments in ((Post, Comment), (ArchivedPost, ArchivedComment)):
+        bump('group', *distinct(
+            posts.objects.filter(author_id=user_id), 'group_id'))
+        bump('post', *distinct(
+            comments.objects.filter(author_id=user_id), 'post_id'))
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # При правке пост может уйти из группы: её страницу тоже надо сбросить.
+    if instance.pk:
+        (instance._saved_group_id, instance._saved_image,
+         instance._saved_text) = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image', 'text').first() or (None, None, None))
+    if getattr(instance, '_saved_image', None) != instance.image.name:
+        thumbnails.describe(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        feeds.fan_out(instance)
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+    elif instance._saved_group_id != instance.group_id:
+        counters.change(Group, instance._saved_group_id, 'posts_count', -1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+    if created or instance._saved_image != instance.image.name:
+        thumbnails.schedule(instance.image)
+    if created or instance._saved_text != instance.text:
+        search.index(instance)
+    post_changed(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change(Group, instance.group_id, 'posts_count', -1)
+    search.unindex(instance)
+    post_changed(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change(Post, instance.post_id, 'comments_count', 1)
+    bump('post', instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change(Post, instance.post_id, 'comments_count', -1)
+    bump('post', instance.post_id)
+
+
+def group_record(group):
+    return autocomplete.group_record(group.pk, group.slug, group.title)
+
+
+def user_record(user):
+    return autocomplete.user_record(
+        user.pk, user.username, user.first_name, user.last_name)
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, raw=False, **kwargs):
+    # Прежние название и slug нужны, чтобы убрать их из подсказок
+    # и заметить переименование.
+    if not raw and instance.pk:
+        saved = Group.objects.filter(pk=instance.pk).values_list(
+            'slug', 'title').first()
+        instance._saved_record = saved and autocomplete.group_record(
+            instance.pk, *saved)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump('global', 0)
+    bump('group', instance.pk)
+    saved = getattr(instance, '_saved_record', None)
+    record = group_record(instance)
+    if saved and saved != record:
+        group_renamed(instance.pk)
+    autocomplete.changed(saved, record)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    autocomplete.changed(old=group_record(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.backfill(instance.user_id, instance.author_id)
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+        follow_changed(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feeds.trim(instance.user_id, instance.author_id)
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+    follow_changed(instance)
+
+
+def names_changed(update_fields):
+    # Вход в систему сохраняет только last_login: имена не менялись.
+    return update_fields is None or bool(NAME_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and instance.pk and names_changed(update_fields):
+        saved = User.objects.filter(pk=instance.pk).values_list(
+            'username', 'first_name', 'last_name').first()
+        instance._saved_record = saved and autocomplete.user_record(
+            instance.pk, *saved)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    if not names_changed(update_fields):
+        return
+    saved = getattr(instance, '_saved_record', None)
+    record = user_record(instance)
+    if saved and saved != record:
+        user_renamed(instance.pk)
+    autocomplete.changed(saved, record)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    autocomplete.changed(old=user_record(instance))
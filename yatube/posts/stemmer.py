@@ -0,0 +1,102 @@
+"""Стеммер Snowball для русского языка.
+
+Отбрасывает окончания, чтобы разные формы слова («пост», «постами»,
+«постов») давали одну основу. Правила и наборы окончаний взяты из
+описания алгоритма на snowballstem.org.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+WORD = re.compile(r'\w+')
+
+# Окончания первой группы снимаются только после «а» или «я».
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+DERIVATIONAL = ((), ('ост', 'ость'))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+
+
+def region(word, start=0):
+    """Начало области после первой согласной, идущей за гласной."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def remove(word, start, endings):
+    """Снимает самое длинное окончание из endings внутри word[start:].
+
+    Возвращает слово и признак того, что окончание нашлось.
+    """
+    after_a, anywhere = endings
+    tail = word[start:]
+    found = max((ending for ending in (*after_a, *anywhere)
+                 if tail.endswith(ending)), key=len, default=None)
+    if found is None:
+        return word, False
+    if found in after_a and tail[:-len(found)][-1:] not in ('а', 'я'):
+        return word, False
+    return word[:-len(found)], True
+
+
+# Словарь живого текста невелик, а слова в нём повторяются: основа
+# каждого считается один раз, например при перестройке индекса.
+@lru_cache(maxsize=100000)
+def stem(word):
+    """Основа русского слова; прочие слова возвращаются как есть."""
+    word = word.lower().replace('ё', 'е')
+    vowel = next((i for i, char in enumerate(word) if char in VOWELS), None)
+    if vowel is None:
+        return word
+    rv = vowel + 1
+    r2 = region(word, region(word))
+    word, done = remove(word, rv, PERFECTIVE_GERUND)
+    if not done:
+        word, _ = remove(word, rv, REFLEXIVE)
+        word, done = remove(word, rv, ADJECTIVE)
+        if done:
+            word, _ = remove(word, rv, PARTICIPLE)
+        else:
+            word, done = remove(word, rv, VERB)
+            if not done:
+                word, _ = remove(word, rv, NOUN)
+    if word[rv:].endswith('и'):
+        word = word[:-1]
+    word, _ = remove(word, r2, DERIVATIONAL)
+    word, done = remove(word, rv, SUPERLATIVE)
+    if word[rv:].endswith('нн'):
+        word = word[:-1]
+    elif not done and word[rv:].endswith('ь'):
+        word = word[:-1]
+    return word
+
+
+def stems(text):
+    """Основы всех слов текста по порядку."""
+    return [stem(word) for word in WORD.findall(text)]
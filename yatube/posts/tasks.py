@@ -0,0 +1,88 @@
+import datetime as dt
+import json
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(func):
+    """Регистрирует функцию как фоновую задачу под её полным именем."""
+    registry[f'{func.__module__}.{func.__name__}'] = func
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    return func
+
+
+def enqueue(func, key=None, revive=False, **params):
+    """Ставит задачу в очередь в текущей транзакции.
+
+    Задача с тем же ключом, которая ещё не выполнена, повторно
+    не ставится. Задачу, исчерпавшую TASK_MAX_ATTEMPTS попыток, заново
+    ставит только revive=True: так делают явные источники работы вроде
+    загрузки картинки, а не показ страницы. Обработчик увидит задачу
+    только после коммита.
+    """
+    key = key or f'{func.task_name}:{json.dumps(params, sort_keys=True)}'
+    if revive:
+        Task.objects.filter(
+            key=key, attempts__gte=settings.TASK_MAX_ATTEMPTS,
+        ).update(payload=json.dumps(params), attempts=0, run_after=None)
+    Task.objects.bulk_create([Task(
+        name=func.task_name, key=key, payload=json.dumps(params),
+    )], ignore_conflicts=True)
+
+
+def claim():
+    """Забирает ближайшую задачу, отодвигая её для других обработчиков.
+
+    Если обработчик упадёт, задача вернётся в очередь через
+    TASK_LEASE секунд.
+    """
+    now = timezone.now()
+    due = Task.objects.filter(
+        Q(run_after__isnull=True) | Q(run_after__lte=now),
+        attempts__lt=settings.TASK_MAX_ATTEMPTS,
+    )
+    for job in due[:10]:
+        lease = now + dt.timedelta(seconds=settings.TASK_LEASE)
+        taken = Task.objects.filter(
+            pk=job.pk, run_after=job.run_after, attempts=job.attempts,
+        ).update(run_after=lease)
+        if taken:
+            job.run_after = lease
+            return job
+    return None
+
+
+def run(job):
+    """Выполняет задачу; неудачная повторяется с растущей задержкой."""
+    try:
+        registry[job.name](**json.loads(job.payload))
+    except Exception as error:
+        logger.exception('Задача %s не выполнена', job.key)
+        job.attempts += 1
+        job.error = repr(error)
+        job.run_after = timezone.now() + dt.timedelta(
+            seconds=settings.TASK_RETRY_DELAY * 2 ** job.attempts)
+        job.save(update_fields=['attempts', 'error', 'run_after'])
+        return False
+    job.delete()
+    return True
+
+
+def run_pending():
+    """Выполняет все задачи, готовые к запуску; возвращает их число."""
+    done = 0
+    job = claim()
+    while job is not None:
+        run(job)
+        done += 1
+        job = claim()
+    return done
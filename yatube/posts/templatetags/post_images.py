@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post):
+    """Картинка поста в нескольких ширинах и форматах."""
+    return {'image': thumbnails.responsive(post)}
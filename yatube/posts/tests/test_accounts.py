@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import accounts, tasks
+from ..models import (
+    AccountDeletion, ArchivedComment, ArchivedPost, Comment, FeedEntry,
+    Follow, Post, Task, UserStats,
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, ACCOUNT_DELETION_BATCH=2,
+                   ACCOUNT_DELETION_PAUSE=0)
+class AccountDeletionTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='Author_delete')
+        self.reader = User.objects.create_user(username='Reader_delete')
+        self.other = User.objects.create_user(username='Other_delete')
+        self.shared = Post.objects.create(
+            author=self.author, text='Картинка, как у другого',
+            image=SimpleUploadedFile('shared.gif', SMALL_GIF, 'image/gif'))
+        self.own = Post.objects.create(
+            author=self.author, text='Своя картинка',
+            image=SimpleUploadedFile('own.gif', SMALL_GIF + b'own',
+                                     'image/gif'))
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        self.kept = Post.objects.create(
+            author=self.other, text='Чужой пост',
+            image=SimpleUploadedFile('copy.gif', SMALL_GIF, 'image/gif'))
+        Comment.objects.create(
+            post=self.kept, author=self.author, text='Комментарий автора')
+        Comment.objects.create(
+            post=self.own, author=self.reader, text='Комментарий читателя')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.author, author=self.other)
+        Task.objects.all().delete()
+
+    def path(self, post):
+        return os.path.join(TEMP_MEDIA_ROOT, post.image.name)
+
+    def test_request_disables_user(self):
+        """Запрос отключает пользователя и ставит задачу в очередь."""
+        deletion = accounts.request_deletion(self.author)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertEqual(deletion.username, 'Author_delete')
+        # Комментарий, две подписки, лента из поста другого автора,
+        # чужой комментарий к посту автора, 5 постов.
+        self.assertEqual(deletion.total, 10)
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(accounts.request_deletion(self.author), deletion)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_deletion_in_chunks(self):
+        """Задача удаляет всё порциями и сохраняет счётчики верными."""
+        own_path, shared_path = self.path(self.own), self.path(self.shared)
+        deletion = accounts.request_deletion(self.author)
+        tasks.run_pending()
+        deletion.refresh_from_db()
+        self.assertIsNotNone(deletion.finished)
+        self.assertEqual(deletion.deleted, deletion.total)
+        self.assertEqual(deletion.progress, 1.0)
+        self.assertEqual(deletion.files_deleted, 1)
+        self.assertFalse(User.objects.filter(
+            username='Author_delete').exists())
+        self.assertFalse(Post.objects.filter(
+            author_id=self.author.pk).exists())
+        self.assertFalse(FeedEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertFalse(os.path.exists(own_path))
+        # Файл общий с постом другого автора и остаётся.
+        self.assertTrue(os.path.exists(shared_path))
+        self.kept.refresh_from_db()
+        self.assertEqual(self.kept.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.other).followers_count, 0)
+
+    @override_settings(ACCOUNT_DELETION_BUDGET=0)
+    def test_progress_between_parts(self):
+        """Часть задачи удаляет порцию и ставит в очередь следующую."""
+        deletion = accounts.request_deletion(self.author)
+        tasks.run(tasks.claim())
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.step, 'comments')
+        self.assertEqual(deletion.deleted, 1)
+        self.assertIsNone(deletion.finished)
+        self.assertEqual(Task.objects.count(), 1)
+        tasks.run_pending()
+        deletion.refresh_from_db()
+        self.assertIsNotNone(deletion.finished)
+
+    @override_settings(ACCOUNT_DELETION_BUDGET=0)
+    def test_replies_in_own_chunks(self):
+        """Чужие комментарии к постам не удаляются вместе с постами."""
+        for number in range(3):
+            Comment.objects.create(
+                post=self.shared, author=self.reader, text=f'Ответ {number}')
+        archived = ArchivedPost.objects.create(
+            author=self.author, text='Архивный пост',
+            pub_date=self.shared.pub_date)
+        ArchivedComment.objects.bulk_create(
+            ArchivedComment(post=archived, author=self.reader,
+                            text=f'Архивный ответ {number}',
+                            created=self.shared.pub_date)
+            for number in range(3))
+        deletion = accounts.request_deletion(self.author)
+        self.assertEqual(deletion.total, 17)
+        job = tasks.claim()
+        while job is not None:
+            comments = (Comment.objects.count()
+                        + ArchivedComment.objects.count())
+            tasks.run(job)
+            removed = comments - (Comment.objects.count()
+                                  + ArchivedComment.objects.count())
+            self.assertLessEqual(removed, 2)
+            job = tasks.claim()
+        deletion.refresh_from_db()
+        self.assertIsNotNone(deletion.finished)
+        self.assertFalse(Comment.objects.filter(author=self.reader).exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+
+    def test_view(self):
+        """Пользователь подтверждает удаление и выходит из системы."""
+        client = Client()
+        client.force_login(self.author)
+        url = reverse('users:delete_account')
+        response = client.get(url)
+        self.assertTemplateUsed(response, 'users/delete_account.html')
+        response = client.post(url)
+        self.assertTemplateUsed(response, 'users/delete_account_done.html')
+        self.assertTrue(AccountDeletion.objects.filter(
+            user=self.author).exists())
+        response = client.get(url)
+        self.assertRedirects(response, f'{reverse("users:login")}?next={url}')
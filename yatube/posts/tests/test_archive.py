@@ -0,0 +1,95 @@
+import datetime as dt
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import counters, exporter
+from ..models import (
+    ArchivedComment, ArchivedPost, Comment, FeedEntry, Follow, Group, Post,
+    UserStats,
+)
+
+User = get_user_model()
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author_archive')
+        self.reader = User.objects.create_user(username='Reader_archive')
+        self.group = Group.objects.create(
+            title='Группа', slug='archive', description='-')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.old = Post.objects.create(
+            author=self.author, group=self.group, text='Старый пост')
+        Post.objects.filter(pk=self.old.pk).update(
+            pub_date=timezone.now() - dt.timedelta(days=400))
+        Comment.objects.create(
+            post=self.old, author=self.reader, text='Старый комментарий')
+        self.new = Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def archive(self):
+        out = StringIO()
+        call_command('archive_posts', stdout=out)
+        return out.getvalue()
+
+    def test_move(self):
+        """Старый пост с комментариями переезжает в архив под своим id."""
+        self.assertIn('перенесено: 1', self.archive())
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)),
+                         [self.new.pk])
+        archived = ArchivedPost.objects.get(pk=self.old.pk)
+        self.assertEqual(archived.text, 'Старый пост')
+        self.assertEqual(archived.comments_count, 1)
+        self.assertEqual(ArchivedComment.objects.get().post, archived)
+        self.assertFalse(FeedEntry.objects.filter(post=self.old.pk).exists())
+        # Профиль по-прежнему показывает оба поста, группа - только новый.
+        self.assertEqual(UserStats.objects.get(
+            user=self.author).posts_count, 2)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        counters.rebuild()
+        self.assertEqual(UserStats.objects.get(
+            user=self.author).posts_count, 2)
+        self.assertIn('перенесено: 0', self.archive())
+
+    def test_pages(self):
+        """Архивный пост открывается по id и виден в профиле автора."""
+        self.archive()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old.pk]))
+        self.assertEqual(response.context['post_info'].text, 'Старый пост')
+        self.assertContains(response, 'Старый комментарий')
+        self.assertNotContains(
+            response, reverse('posts:post_edit', args=[self.old.pk]))
+        self.assertNotContains(
+            response, reverse('posts:add_comment', args=[self.old.pk]))
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username]))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [self.new.pk, self.old.pk])
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=[self.group.slug])):
+            response = self.client.get(url)
+            self.assertEqual(
+                [post.pk for post in response.context['page_obj']],
+                [self.new.pk])
+
+    def test_export(self):
+        """Выгрузка автора включает и архивные посты, и комментарии."""
+        self.archive()
+        self.assertEqual(
+            [row['id'] for row in exporter.post_records(self.author)],
+            [self.old.pk, self.new.pk])
+        self.assertEqual(
+            [row['text'] for row in exporter.comment_records(self.reader)],
+            ['Старый комментарий'])
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import autocomplete
+from ..models import Group
+
+User = get_user_model()
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='ivanov_i', first_name='Иван', last_name='Иванов')
+        User.objects.create_user(username='petrov')
+        cls.group = Group.objects.create(
+            title='Ёжики в тумане', slug='hedgehogs', description='-')
+
+    def setUp(self):
+        autocomplete.reset()
+        self.guest_client = Client()
+
+    def labels(self, query):
+        response = self.guest_client.get(
+            reverse('posts:autocomplete'), {'q': query})
+        return [item['label'] for item in response.json()['results']]
+
+    def test_prefixes(self):
+        """Подсказки по началу username, имени, фамилии и названия группы."""
+        user_label = 'Иван Иванов (ivanov_i)'
+        cases = {
+            'iva': [user_label],
+            'Иванов': [user_label],
+            'иван ив': [user_label],
+            'ежики': [self.group.title],
+            'ТУМ': [self.group.title],
+            'hedge': [self.group.title],
+            'p': ['petrov'],
+            'x': [],
+            '': [],
+        }
+        for query, labels in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.labels(query), labels)
+        response = self.guest_client.get(
+            reverse('posts:autocomplete'), {'q': 'hedge'})
+        self.assertEqual(response.json()['results'][0]['url'], reverse(
+            'posts:group_list', args=[self.group.slug]))
+
+    def test_signals_update_index(self):
+        """Новые, переименованные и удалённые записи сразу видны."""
+        self.assertEqual(self.labels('sid'), [])
+        User.objects.create_user(username='sidorov')
+        self.assertEqual(self.labels('sid'), ['sidorov'])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Котики'
+        group.save()
+        self.assertEqual(self.labels('ежи'), [])
+        self.assertEqual(self.labels('кот'), ['Котики'])
+        group.delete()
+        self.assertEqual(self.labels('кот'), [])
+
+    @override_settings(AUTOCOMPLETE_LIMIT=2)
+    def test_limit(self):
+        """Подсказок не больше AUTOCOMPLETE_LIMIT."""
+        User.objects.bulk_create(
+            User(username=f'many{i}') for i in range(5))
+        self.assertEqual(self.labels('many'), ['many0', 'many1'])
@@ -0,0 +1,132 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author_counter')
+        cls.reader = User.objects.create_user(username='Reader_counter')
+        cls.group = Group.objects.create(
+            title='Тестовая группа счётчиков',
+            slug='test_slug_counter',
+            description='Тестовое описание группы',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа счётчиков',
+            slug='test_slug_counter_other',
+            description='Тестовое описание группы',
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание и удаление поста меняют счётчики автора и группы."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_group_change_moves_counter(self):
+        """Перенос поста в другую группу переносит и счётчик."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(
+            dict(Group.objects.values_list('slug', 'posts_count')),
+            {self.group.slug: 0, self.other_group.slug: 1})
+
+    def test_comment_counter(self):
+        """Комментарии считаются в посте."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обеих сторон."""
+        client = Client()
+        client.force_login(self.reader)
+        kwargs = {'username': self.author.username}
+        client.get(reverse('posts:profile_follow', kwargs=kwargs))
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        client.get(reverse('posts:profile_unfollow', kwargs=kwargs))
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_rebuild_counters(self):
+        """Команда пересчитывает счётчики после массовой загрузки."""
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=f'Пост {i}')
+            for i in range(3))
+        Follow.objects.bulk_create(
+            [Follow(user=self.reader, author=self.author)])
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertEqual(self.stats(self.author).posts_count, 3)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+    def test_stale_counters_do_not_hide_rows(self):
+        """Отставший счётчик не прячет посты и комментарии со страниц."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        Group.objects.filter(pk=self.group.pk).update(posts_count=0)
+        Post.objects.filter(pk=post.pk).update(comments_count=0)
+        UserStats.objects.filter(user=self.author).update(posts_count=0)
+        client = Client()
+        pages = (
+            ('posts:group_list', self.group.slug, 'page_obj'),
+            ('posts:profile', self.author.username, 'page_obj'),
+            ('posts:post_detail', post.pk, 'comments'),
+        )
+        for name, arg, key in pages:
+            with self.subTest(page=name):
+                response = client.get(reverse(name, args=[arg]))
+                self.assertEqual(len(response.context[key]), 1)
+
+    def test_missing_stats(self):
+        """Страницы автора без строки счётчиков заводят её по данным."""
+        User.objects.bulk_create([User(username='Loaded_counter')])
+        author = User.objects.get(username='Loaded_counter')
+        Post.objects.bulk_create([
+            Post(author=author, text=f'Пост {number}')
+            for number in range(2)])
+        Follow.objects.bulk_create([Follow(user=self.reader, author=author)])
+        self.assertFalse(UserStats.objects.filter(user=author).exists())
+        client = Client()
+        response = client.get(reverse('posts:post_detail', args=[
+            Post.objects.filter(author=author).first().pk]))
+        self.assertContains(response, 'Всего постов автора')
+        stats = self.stats(author)
+        self.assertEqual((stats.posts_count, stats.followers_count), (2, 1))
+        stats.delete()
+        response = client.get(reverse('posts:profile', args=[
+            author.username]))
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
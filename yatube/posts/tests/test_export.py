@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author_export')
+        cls.stranger = User.objects.create_user(username='Stranger_export')
+        cls.staff = User.objects.create_user(
+            username='Staff_export', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='export', description='-')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}',
+                                group=cls.group)
+            for number in range(5)
+        ]
+        cls.image_post = Post.objects.create(
+            author=cls.author, text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Комментарий')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def export(self, client=None, **params):
+        return (client or self.client).get(
+            reverse('posts:export', args=[self.author.username]), params)
+
+    def test_jsonl(self):
+        """Посты выдаются потоком в формате import_data."""
+        response = self.export()
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts]
+                         + [self.image_post.pk])
+        self.assertEqual(rows[0]['group'], 'export')
+        self.assertEqual(rows[0]['author'], self.author.username)
+
+    def test_csv_comments(self):
+        """Комментарии выдаются в CSV с заголовком."""
+        response = self.export(kind='comments', format='csv')
+        reader = csv.DictReader(io.StringIO(
+            b''.join(response.streaming_content).decode()))
+        rows = list(reader)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['post'], str(self.posts[0].pk))
+        self.assertEqual(rows[0]['text'], 'Комментарий')
+
+    def test_zip_with_images(self):
+        """Архив собирается на лету вместе с картинками постов."""
+        response = self.export(format='zip')
+        archive = zipfile.ZipFile(io.BytesIO(
+            b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.read(self.image_post.image.name), SMALL_GIF)
+        self.assertEqual(
+            len(archive.read('posts.jsonl').decode().splitlines()), 6)
+        self.assertIn('comments.jsonl', archive.namelist())
+        response = self.export(format='zip', images='0')
+        archive = zipfile.ZipFile(io.BytesIO(
+            b''.join(response.streaming_content)))
+        self.assertEqual(sorted(archive.namelist()),
+                         ['comments.jsonl', 'posts.jsonl'])
+
+    def test_access(self):
+        """Выгрузку получают автор и персонал, остальные - 403."""
+        stranger = Client()
+        stranger.force_login(self.stranger)
+        self.assertEqual(self.export(stranger).status_code,
+                         HTTPStatus.FORBIDDEN)
+        staff = Client()
+        staff.force_login(self.staff)
+        self.assertEqual(self.export(staff).status_code, HTTPStatus.OK)
+        self.assertEqual(self.export(format='xml').status_code,
+                         HTTPStatus.BAD_REQUEST)
+
+    def test_command(self):
+        """Команда пишет ту же выгрузку в файл."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'posts.jsonl')
+        call_command('export_user', self.author.username, '--output', path)
+        with open(path, encoding='utf-8') as file_:
+            self.assertEqual(len(file_.readlines()), 6)
@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import tasks
+from ..models import FeedEntry, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author_feed')
+        cls.other_author = User.objects.create_user(username='Other_feed')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки')
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='Reader_feed')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow(self, author):
+        self.authorized_client.get(reverse('posts:profile_follow', kwargs={
+            'username': author.username}))
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту уже написанные посты автора."""
+        self.follow(self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.user, post=self.old_post).exists())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков и только в них."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        entry = FeedEntry.objects.get(user=self.user, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertFalse(FeedEntry.objects.filter(
+            post=post).exclude(user=self.user).exists())
+
+    def test_unfollow_trims_feed(self):
+        """Отписка убирает из ленты посты автора, но не чужие."""
+        self.follow(self.author)
+        self.follow(self.other_author)
+        other_post = Post.objects.create(
+            author=self.other_author, text='Пост другого автора')
+        self.authorized_client.get(reverse('posts:profile_unfollow', kwargs={
+            'username': self.author.username}))
+        self.assertEqual(
+            list(FeedEntry.objects.filter(user=self.user).values_list(
+                'post', flat=True)),
+            [other_post.pk])
+
+    def test_follow_page_reads_feed_in_order(self):
+        """Страница подписок показывает посты ленты от новых к старым."""
+        self.follow(self.author)
+        new_post = Post.objects.create(author=self.author, text='Свежий')
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [new_post, self.old_post])
+
+
+@override_settings(FEED_PULL_THRESHOLD=2, POSTS_LIMIT=3)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='Star_feed')
+        cls.author = User.objects.create_user(username='Author_feed')
+        cls.reader = User.objects.create_user(username='Reader_feed')
+        fan = User.objects.create_user(username='Fan_feed')
+        Follow.objects.bulk_create([
+            Follow(user=cls.reader, author=cls.star),
+            Follow(user=fan, author=cls.star),
+            Follow(user=cls.reader, author=cls.author),
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_popular_author_is_not_fanned_out(self):
+        """Пост популярного автора не раскладывается по лентам."""
+        post = Post.objects.create(author=self.star, text='Пост звезды')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        post = Post.objects.create(author=self.author, text='Обычный пост')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Лента сливает обе части по дате и листается курсором."""
+        posts = [
+            Post.objects.create(
+                author=(self.star, self.author)[i % 2], text=f'Пост {i}')
+            for i in range(7)
+        ]
+        url = reverse('posts:follow_index')
+        page_obj = self.authorized_client.get(url).context['page_obj']
+        seen = [post.pk for post in page_obj]
+        while page_obj.has_next():
+            page_obj = self.authorized_client.get(
+                url, {'after': page_obj.next_cursor}).context['page_obj']
+            seen.extend(post.pk for post in page_obj)
+        self.assertEqual(seen, [post.pk for post in reversed(posts)])
+        second = self.authorized_client.get(
+            url, {'page': 2}).context['page_obj']
+        self.assertEqual([post.pk for post in second], seen[3:6])
+
+    @override_settings(FEED_PULL_THRESHOLD=3)
+    def test_threshold_drop(self):
+        """Ушедший из популярных автор раскладывается по лентам заново.
+
+        Посты, написанные в популярности, и подписки того времени не
+        пропадают из лент ни до раскладки, ни после неё.
+        """
+        newcomer = User.objects.create_user(username='Newcomer_feed')
+        Follow.objects.create(user=newcomer, author=self.star)
+        post = Post.objects.create(author=self.star, text='Пост звезды')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertTrue(UserStats.objects.get(user=self.star).feed_pulled)
+        Follow.objects.filter(user__username='Fan_feed').delete()
+        cache.clear()
+        url = reverse('posts:follow_index')
+        self.assertIn(
+            post, self.authorized_client.get(url).context['page_obj'])
+        tasks.run_pending()
+        self.assertFalse(UserStats.objects.get(user=self.star).feed_pulled)
+        self.assertEqual(
+            set(FeedEntry.objects.filter(post=post).values_list(
+                'user__username', flat=True)),
+            {'Reader_feed', 'Newcomer_feed'})
+        cache.clear()
+        self.assertIn(
+            post, self.authorized_client.get(url).context['page_obj'])
+        fresh = Post.objects.create(author=self.star, text='Новый пост')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=newcomer, post=fresh).exists())
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -14,6 +15,13 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 User = get_user_model()
 
 
+def image_name(content, name):
+    """Имя, под которым хранилище сохранит файл с таким содержимым."""
+    digest = hashlib.sha256(content).hexdigest()
+    extension = name.rpartition('.')[2]
+    return f'posts/{digest[:2]}/{digest}.{extension}'
+
+
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostFormTests(TestCase):
     @classmethod
@@ -76,7 +84,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text=form_data['text'],
                 group=self.group_1,
-                image="posts/small.gif"
+                image=image_name(small_gif, 'small.gif')
             ).exists()
         )
 
@@ -188,7 +196,7 @@ class PostFormTests(TestCase):
             Post.objects.filter(
                 text=form_data['text'],
                 group=self.group_1,
-                image="posts/small.gif"
+                image=image_name(small_gif, 'small.gif')
             ).exists()
         )
 
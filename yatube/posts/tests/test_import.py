@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .. import search
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author_import')
+        cls.group = Group.objects.create(
+            title='Группа импорта', slug='import', description='-')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file_:
+            file_.write(content)
+        return path
+
+    def jsonl(self, name, records):
+        return self.write(name, ''.join(
+            json.dumps(record, ensure_ascii=False) + '\n'
+            for record in records))
+
+    def load(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_data', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_posts_comments_follows(self):
+        """Посты, комментарии и подписки из JSONL попадают на сайт."""
+        posts = self.jsonl('posts.jsonl', [
+            {'id': 500, 'author': 'Author_import', 'group': 'import',
+             'text': 'Импортированные коты',
+             'pub_date': '2020-01-02T03:04:05'},
+            {'id': 501, 'author': 'newcomer', 'group': 'new-group',
+             'text': 'Пост нового автора'},
+        ])
+        comments = self.jsonl('comments.jsonl', [
+            {'post': 500, 'author': 'newcomer', 'text': 'Комментарий',
+             'created': '2020-01-03T00:00:00'},
+        ])
+        follows = self.jsonl('follows.jsonl', [
+            {'user': 'newcomer', 'author': 'Author_import'},
+        ])
+        self.load('posts', posts, '--batch-size', '1')
+        self.load('follows', follows)
+        self.load('comments', comments)
+
+        post = Post.objects.get(pk=500)
+        self.assertEqual(post.author, self.author)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2020)
+        newcomer = User.objects.get(username='newcomer')
+        self.assertFalse(newcomer.has_usable_password())
+        self.assertEqual(Post.objects.get(pk=501).group.slug, 'new-group')
+        comment = Comment.objects.get(post=post)
+        self.assertEqual(comment.created.day, 3)
+        self.assertTrue(Follow.objects.filter(
+            user=newcomer, author=self.author).exists())
+        # Производные данные пересчитаны после загрузки.
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=newcomer, post=post).exists())
+        self.assertEqual(
+            list(search.filter_posts(Post.objects.all(), 'кот')), [post])
+
+    def test_csv_and_repeat(self):
+        """CSV читается по заголовкам; повторная загрузка не дублирует."""
+        path = self.write(
+            'posts.csv',
+            'id,author,group,text,pub_date\n'
+            '600,Author_import,,Пост из CSV,2021-05-06 07:08:09\n')
+        out, _ = self.load('posts', path)
+        self.assertIn('Добавлено: 1', out)
+        out, _ = self.load('posts', path)
+        self.assertIn('Добавлено: 0', out)
+        self.assertEqual(Post.objects.get(pk=600).text, 'Пост из CSV')
+
+    def test_bad_records_skipped(self):
+        """Ошибочные записи пропускаются с причиной, остальные пишутся."""
+        path = self.write('comments.jsonl', '\n'.join([
+            'не json',
+            json.dumps({'post': 999, 'author': 'Author_import',
+                        'text': 'К несуществующему посту'}),
+            json.dumps({'post': 1, 'text': 'Без автора'}),
+            json.dumps({'author': 'Author_import', 'text': 'Без поста'}),
+        ]))
+        out, err = self.load('comments', path)
+        self.assertIn('пропущено: 4', out)
+        self.assertIn('Нет поста 999', err)
+        self.assertIn(f'{path}:1', err)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_derived_data_updated_in_place(self):
+        """Импорт не пересобирает ленты и поиск, а дописывает их."""
+        reader = User.objects.create_user(username='Reader_import')
+        Follow.objects.create(user=reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        entry = FeedEntry.objects.get(user=reader)
+        comments = self.jsonl('comments.jsonl', [
+            {'post': post.pk, 'author': 'Reader_import', 'text': 'Ответ'},
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            self.load('comments', comments)
+        touched = [query['sql'] for query in queries
+                   if 'feedentry' in query['sql']
+                   or search.TABLE in query['sql']]
+        self.assertEqual(touched, [])
+        posts = self.jsonl('posts.jsonl', [
+            {'author': 'Author_import', 'text': 'Новые коты'},
+        ])
+        self.load('posts', posts)
+        new = Post.objects.get(text='Новые коты')
+        self.assertTrue(FeedEntry.objects.filter(pk=entry.pk).exists())
+        self.assertTrue(FeedEntry.objects.filter(
+            user=reader, post=new).exists())
+        self.assertEqual(
+            list(search.filter_posts(Post.objects.all(), 'кот')), [new])
+
+    def test_unknown_format(self):
+        path = self.write('posts.xml', '')
+        with self.assertRaises(CommandError):
+            self.load('posts', path)
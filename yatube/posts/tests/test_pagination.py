@@ -0,0 +1,126 @@
+import datetime as dt
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import counters
+from ..models import Group, Post
+from ..pagination import decode_cursor, encode_cursor, page_window
+
+User = get_user_model()
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author_cursor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа курсоров',
+            slug='test_slug_cursor',
+            description='Тестовое описание группы',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(25)
+        )
+        counters.rebuild()
+        # Половина постов с одинаковой датой: порядок держится на id.
+        moment = timezone.now() - dt.timedelta(days=1)
+        same_date = Post.objects.order_by('pk')[:12].values('pk')
+        Post.objects.filter(pk__in=same_date).update(pub_date=moment)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def walk(self, url):
+        """Проходит ленту по ссылкам «Следующая» до конца."""
+        response = self.guest_client.get(url)
+        seen = []
+        while True:
+            page_obj = response.context['page_obj']
+            seen.extend(post.pk for post in page_obj)
+            if not page_obj.has_next():
+                return seen, page_obj
+            response = self.guest_client.get(
+                url, {'after': page_obj.next_cursor})
+
+    def test_cursor_round_trip(self):
+        """Курсор восстанавливает дату и id без потерь."""
+        post = Post.objects.first()
+        self.assertEqual(
+            decode_cursor(encode_cursor(post.pub_date, post.pk)),
+            (post.pub_date, post.pk))
+        self.assertIsNone(decode_cursor('мусор'))
+
+    def test_next_links_walk_whole_feed(self):
+        """По курсорам ленты проходятся целиком без пропусков и повторов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={
+                'username': self.author.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                seen, last_page = self.walk(url)
+                self.assertEqual(seen, self.expected)
+                self.assertTrue(last_page.has_previous())
+
+    def test_previous_link_returns_previous_page(self):
+        """Ссылка «Предыдущая» возвращает ту же страницу, что и раньше."""
+        url = reverse('posts:index')
+        second = self.guest_client.get(url, {'page': 2}).context['page_obj']
+        third = self.guest_client.get(
+            url, {'after': second.next_cursor}).context['page_obj']
+        back = self.guest_client.get(
+            url, {'before': third.previous_cursor}).context['page_obj']
+        self.assertEqual([post.pk for post in back],
+                         [post.pk for post in second])
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору читается одним запросом без COUNT(*)."""
+        page_obj = self.guest_client.get(
+            reverse('posts:index')).context['page_obj']
+        cursor = page_obj.next_cursor
+        paginator = page_obj.paginator
+        with self.assertNumQueries(1):
+            next_page = paginator.seek(after=cursor)
+            self.assertEqual(len(next_page), 10)
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'abc'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 1)
+        self.assertEqual(page_obj[0].pk, self.expected[0])
+
+
+class PageWindowTests(SimpleTestCase):
+    def window(self, number, pages):
+        return page_window(Paginator(range(pages), 1).page(number))
+
+    def test_window_is_elided(self):
+        """Из сотни страниц выводятся края и соседи текущей."""
+        self.assertEqual(self.window(50, 100),
+                         [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(self.window(1, 100), [1, 2, 3, None, 100])
+        self.assertEqual(self.window(100, 100), [1, None, 98, 99, 100])
+
+    def test_single_gap_is_not_elided(self):
+        """Пропуск в одну страницу заменяется её номером."""
+        self.assertEqual(self.window(5, 9), list(range(1, 10)))
+
+    def test_few_pages_are_listed(self):
+        """Короткий список страниц выводится целиком."""
+        self.assertEqual(self.window(1, 1), [1])
+        self.assertEqual(self.window(2, 4), [1, 2, 3, 4])
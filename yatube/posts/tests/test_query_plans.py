@@ -0,0 +1,79 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..feeds import follow_feed
+from ..models import Follow, Group, Post
+from ..pagination import COMMENT_ORDERING, Keyset
+
+User = get_user_model()
+# Полный проход по таблице: «SCAN t», до SQLite 3.36 - «SCAN TABLE t»,
+# с псевдонимом - «... AS u». Проход по индексу содержит USING.
+FULL_SCAN = re.compile(r'SCAN (TABLE )?\S+( AS \S+)?$')
+
+
+def query_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='Reader_plan')
+        cls.author = User.objects.create_user(username='Author_plan')
+        cls.star = User.objects.create_user(username='Star_plan')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plan', description='-')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.star)
+
+    def assertIndexed(self, name, queryset):
+        for step in query_plan(queryset):
+            with self.subTest(query=name, step=step):
+                self.assertNotIn('TEMP B-TREE', step)
+                self.assertIsNone(FULL_SCAN.match(step))
+
+    def assertPagesIndexed(self, name, keyset):
+        """Первая страница и страницы по курсору в обе стороны."""
+        cursor = (timezone.now(), self.post.pk)
+        self.assertIndexed(name, keyset.window(None)[:11])
+        self.assertIndexed(f'{name} after', keyset.window(cursor)[:11])
+        self.assertIndexed(
+            f'{name} before', keyset.window(cursor, backwards=True)[:11])
+
+    def test_post_pages(self):
+        """Ленты главной, группы и автора читаются по индексу."""
+        self.assertPagesIndexed('index', Keyset(
+            Post.objects.select_related('group', 'author')))
+        self.assertPagesIndexed('group', Keyset(
+            self.group.posts.select_related('author')))
+        self.assertPagesIndexed('profile', Keyset(
+            self.author.posts.select_related('group')))
+        self.assertPagesIndexed('comments', Keyset(
+            self.post.comments.select_related('author'), COMMENT_ORDERING))
+
+    @override_settings(FEED_PULL_THRESHOLD=1)
+    def test_follow_feed(self):
+        """Разложенная и подмешанная части ленты читаются по индексу."""
+        cache.clear()
+        feed = follow_feed(self.reader)
+        for number, part in enumerate(feed.parts):
+            self.assertPagesIndexed(f'feed part {number}', part)
+
+    def test_follow_lookups(self):
+        """Проверка подписки и выбор подписчиков автора."""
+        self.assertIndexed('following', Follow.objects.filter(
+            user=self.reader, author=self.author))
+        self.assertIndexed('followers', Follow.objects.filter(
+            author=self.author).values_list('user_id', flat=True))
+        self.assertIndexed('followed', Follow.objects.filter(
+            user=self.reader).values_list('author_id', flat=True))
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Post
+from ..stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTests(SimpleTestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        for forms in (('пост', 'посты', 'постами', 'постов'),
+                      ('кот', 'коты', 'котами', 'коту'),
+                      ('ёлка', 'елки', 'ёлками')):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+    def test_other_words_kept(self):
+        """Слова не на русском остаются как есть, но в нижнем регистре."""
+        self.assertEqual(stem('Django'), 'django')
+        self.assertEqual(stem('2024'), '2024')
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Author_search')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Коты и кот спят на котах')
+        cls.cat = Post.objects.create(
+            author=cls.author, text='Кот гуляет по крыше')
+        cls.dog = Post.objects.create(
+            author=cls.author, text='Собака лает на почтальона')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def found(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return response, list(response.context['page_obj'])
+
+    def test_word_forms_found_and_ranked(self):
+        """Запрос находит другие формы слова, частые упоминания выше."""
+        _, posts = self.found('котами')
+        self.assertEqual(posts, [self.cats, self.cat])
+        _, posts = self.found('собаками почтальону')
+        self.assertEqual(posts, [self.dog])
+        _, posts = self.found('')
+        self.assertEqual(posts, [])
+
+    def test_index_follows_posts(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        dog = Post.objects.get(pk=self.dog.pk)
+        dog.text = 'Кошка спит'
+        dog.save()
+        self.assertEqual(self.found('собака')[1], [])
+        self.assertEqual(self.found('кошки')[1], [self.dog])
+        Post.objects.get(pk=self.cat.pk).delete()
+        self.assertEqual(self.found('кот')[1], [self.cats])
+        search.rebuild()
+        self.assertEqual(self.found('кошка')[1], [self.dog])
+
+    @override_settings(POSTS_LIMIT=1)
+    def test_pages_walk_by_cursor(self):
+        """Страницы результатов листаются курсором в обе стороны."""
+        response, posts = self.found('кот')
+        self.assertEqual(posts, [self.cats])
+        after = response.context['page_obj'].next_cursor
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%82&amp;after=')
+        response, posts = self.found('кот', after=after)
+        self.assertEqual(posts, [self.cat])
+        self.assertFalse(response.context['page_obj'].has_next())
+        before = response.context['page_obj'].previous_cursor
+        self.assertEqual(self.found('кот', before=before)[1], [self.cats])
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_only_newest_matches_ranked(self):
+        """Ранжируются только SEARCH_MAX_RESULTS самых новых совпадений."""
+        response, posts = self.found('кот')
+        self.assertEqual(posts, [self.cat])
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу и понимает формы слов."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котов'})
+        self.assertEqual(
+            set(response.context['cl'].result_list), {self.cats, self.cat})
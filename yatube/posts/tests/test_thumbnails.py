@@ -0,0 +1,222 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .. import tasks, thumbnails
+from ..models import Post, Task
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@tasks.task
+def broken_task():
+    raise ValueError('Сломано')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author_thumb')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF,
+                content_type='image/gif'),
+        )
+        self.url = reverse('posts:post_detail', kwargs={
+            'post_id': self.post.pk})
+
+    def test_upload_queues_thumbnails(self):
+        """Сохранение картинки ставит миниатюры в очередь."""
+        self.assertTrue(Task.objects.filter(
+            name='posts.thumbnails.make_thumbnails',
+            payload__contains=self.post.image.name,
+        ).exists())
+
+    def test_placeholder_until_worker_runs(self):
+        """До обработчика на странице заглушка, после - миниатюра."""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'img/placeholder.svg')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertEqual(Task.objects.count(), 1)
+        call_command('run_worker', once=True, stdout=StringIO())
+        self.assertFalse(Task.objects.exists())
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'img/placeholder.svg')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_image_metadata(self):
+        """Размеры и вес пишутся при сохранении, превью - обработчиком."""
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (2, 1))
+        self.assertEqual(self.post.image_size, len(SMALL_GIF))
+        self.assertEqual(self.post.image_placeholder, '')
+        tasks.run_pending()
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.image_placeholder.startswith(
+            'data:image/png;base64,'))
+        self.post.image = ''
+        self.post.save()
+        self.assertIsNone(self.post.image_width)
+        self.assertEqual(self.post.image_placeholder, '')
+
+    def test_preview_shown_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, картинкой служит превью из поста."""
+        Post.objects.filter(pk=self.post.pk).update(
+            image_placeholder='data:image/png;base64,AAAA')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'src="data:image/png;base64,AAAA"')
+        self.assertNotContains(response, 'img/placeholder.svg')
+
+    def test_failed_task_is_retried_later(self):
+        """Упавшая задача остаётся в очереди с отложенным повтором."""
+        tasks.enqueue(broken_task)
+        Task.objects.exclude(name=broken_task.task_name).delete()
+        self.assertEqual(tasks.run_pending(), 1)
+        job = Task.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Сломано', job.error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(tasks.run_pending(), 0)
+
+    @override_settings(TASK_MAX_ATTEMPTS=1)
+    def test_dead_task_is_enqueued_again(self):
+        """Исчерпавшую попытки задачу возрождает только revive=True."""
+        tasks.enqueue(broken_task)
+        Task.objects.exclude(name=broken_task.task_name).delete()
+        tasks.run_pending()
+        self.assertEqual(tasks.run_pending(), 0)
+        tasks.enqueue(broken_task)
+        self.assertEqual(Task.objects.get().attempts, 1)
+        tasks.enqueue(broken_task, revive=True)
+        job = Task.objects.get()
+        self.assertEqual(job.attempts, 0)
+        self.assertIsNone(job.run_after)
+        self.assertEqual(tasks.run_pending(), 1)
+
+    def test_page_queues_once_per_image(self):
+        """Показ страницы без миниатюр пишет в очередь раз на картинку."""
+        Task.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        writes = [query['sql'] for query in queries
+                  if 'posts_task' in query['sql']]
+        self.assertEqual(len(writes), 1)
+        self.assertEqual(Task.objects.get().payload, json.dumps(
+            {'name': self.post.image.name}))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse(any('posts_task' in query['sql']
+                             for query in queries))
+
+    @override_settings(TASK_MAX_ATTEMPTS=1)
+    def test_page_does_not_revive_dead_task(self):
+        """Показ страницы не возрождает задачу, сохранение картинки - да."""
+        Task.objects.update(attempts=1)
+        self.client.get(self.url)
+        self.assertEqual(Task.objects.get().attempts, 1)
+        thumbnails.schedule(self.post.image)
+        self.assertEqual(Task.objects.get().attempts, 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPrefetchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='Author_prefetch')
+        for i in range(3):
+            Post.objects.create(
+                author=author,
+                text=f'Пост {i}',
+                image=SimpleUploadedFile(
+                    name=f'prefetch_{i}.gif', content=SMALL_GIF,
+                    content_type='image/gif'),
+            )
+        Post.objects.create(author=author, text='Без картинки')
+        tasks.run_pending()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_thumbnails_in_one_query(self):
+        """Миниатюры страницы читаются одним запросом, шаблон - без них."""
+        posts = list(Post.objects.select_related('author'))
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts)
+        with self.assertNumQueries(0):
+            for post in posts:
+                html = render_to_string(
+                    'includes/post_info.html', {'post': post})
+                if post.image:
+                    self.assertNotIn('img/placeholder.svg', html)
+                    self.assertIn('width="960" height="339"', html)
+
+    def test_responsive_variants(self):
+        """Картинка выводится в нескольких ширинах и в WebP."""
+        post = Post.objects.exclude(image='').first()
+        html = render_to_string('includes/post_info.html', {'post': post})
+        self.assertIn('type="image/webp"', html)
+        for width in thumbnails.WIDTHS:
+            self.assertIn(f'{width}w', html)
+        self.assertIn('.webp', html)
+        self.assertIn(f'sizes="{thumbnails.SIZES}"', html)
+
+    def test_prefetch_is_cached(self):
+        """Повторная выборка миниатюр берёт их из кеша без базы."""
+        posts = list(Post.objects.all())
+        thumbnails.prefetch(posts)
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+
+    def test_missing_is_not_cached(self):
+        """Промах не кешируется: готовую миниатюру видно сразу."""
+        rows = list(KVStoreModel.objects.all())
+        KVStoreModel.objects.all().delete()
+        posts = list(Post.objects.exclude(image=''))
+        thumbnails.prefetch(posts)
+        self.assertFalse(any(posts[0].image.thumbnails.values()))
+        KVStoreModel.objects.bulk_create(rows)
+        posts = list(Post.objects.exclude(image=''))
+        thumbnails.prefetch(posts)
+        self.assertTrue(all(posts[0].image.thumbnails.values()))
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..uploads import ContentAddressedStorage, content_hash
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, name, content=SMALL_GIF):
+        return self.authorized_client.post(reverse('posts:post_create'), {
+            'text': f'Пост с {name}',
+            'image': SimpleUploadedFile(name, content, 'image/gif'),
+        })
+
+    def stored_files(self):
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(os.path.join(TEMP_MEDIA_ROOT,
+                                                       'posts'))
+            for name in names
+        ]
+
+    def test_same_content_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом с именем из хеша."""
+        self.upload('first.gif')
+        self.upload('second.GIF')
+        first, second = Post.objects.order_by('pk')
+        digest = content_hash(ContentFile(SMALL_GIF))
+        self.assertEqual(first.image.name,
+                         f'posts/{digest[:2]}/{digest}.gif')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_oversized_upload_rejected(self):
+        """Картинка больше UPLOAD_MAX_SIZE не сохраняется и даёт ошибку."""
+        with self.settings(UPLOAD_MAX_SIZE=len(SMALL_GIF) - 1):
+            response = self.upload('big.gif')
+        self.assertFalse(Post.objects.exists())
+        self.assertTrue(response.context['form'].has_error('image'))
+        self.assertEqual(self.stored_files(), [])
+
+    def test_oversized_upload_stops_reading(self):
+        """Остаток слишком большой загрузки не читается из запроса."""
+        with self.settings(UPLOAD_MAX_SIZE=1000):
+            response = self.upload('huge.gif', SMALL_GIF * 10000)
+        form = response.context['form']
+        self.assertTrue(form.has_error('image'))
+        self.assertEqual(form['text'].value(), 'Пост с huge.gif')
+        self.assertGreater(response.wsgi_request._stream.remaining, 0)
+
+    def test_storage_hashes_plain_files(self):
+        """Файл не из загрузки хешируется самим хранилищем."""
+        storage = ContentAddressedStorage()
+        name = storage.save('posts/plain.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(
+            name, storage.save('posts/again.gif', ContentFile(SMALL_GIF)))
+        self.assertTrue(name.endswith(
+            content_hash(ContentFile(SMALL_GIF)) + '.gif'))
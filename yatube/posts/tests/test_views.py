@@ -1,10 +1,14 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from .. import counters
 from ..models import Comment, Group, Post, Follow
 
 User = get_user_model()
@@ -341,6 +345,7 @@ class PaginatorViewsTest(TestCase):
             )
             )
         Post.objects.bulk_create(cls.posts)
+        counters.rebuild()
 
     def setUp(self):
         self.guest_client = Client()
@@ -380,6 +385,50 @@ class PaginatorViewsTest(TestCase):
                 response.context.get('page_obj').object_list), 5)
 
 
+@override_settings(COMMENTS_LIMIT=5)
+class CommentPaginationViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author_comments')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.quiet_post = Post.objects.create(author=cls.author, text='Тихо')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=User.objects.create_user(
+                username=f'Commentator_{i}'), text=f'Комментарий {i}')
+            for i in range(12))
+        Comment.objects.create(
+            post=cls.quiet_post, author=cls.author, text='Единственный')
+        counters.rebuild()
+
+    def setUp(self):
+        cache.clear()
+
+    def url(self, post):
+        return reverse('posts:post_detail', kwargs={'post_id': post.pk})
+
+    def test_comment_queries_do_not_grow(self):
+        """Число запросов не зависит от числа комментариев."""
+        with CaptureQueriesContext(connection) as quiet:
+            self.client.get(self.url(self.quiet_post))
+        with CaptureQueriesContext(connection) as busy:
+            self.client.get(self.url(self.post))
+        self.assertEqual(len(busy), len(quiet))
+
+    def test_comments_walk_by_cursor(self):
+        """Комментарии листаются курсором от старых к новым без повторов."""
+        seen = []
+        response = self.client.get(self.url(self.post))
+        while True:
+            page = response.context['comments']
+            seen.extend(comment.text for comment in page)
+            if not page.has_next():
+                break
+            response = self.client.get(
+                self.url(self.post), {'after': page.next_cursor})
+        self.assertEqual(seen, [f'Комментарий {i}' for i in range(12)])
+
+
 class CacheViewTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -408,24 +457,158 @@ class CacheViewTests(TestCase):
         """Проверка кэширования на главной странице index."""
         response = self.guest_client.get(reverse('posts:index'))
         content_before = response.content
+        Post.objects.filter(pk=self.post_1.pk).update(text='Без сигналов')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(content_before, response.content)
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotEqual(content_before, response.content)
+
+    def test_posts_cache_drops_on_post_changes(self):
+        """Новый и удалённый пост сразу видны на страницах ленты."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={
+                'slug': self.post_1.group.slug}),
+            reverse('posts:profile', kwargs={
+                'username': self.post_1.author.username}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
         post = Post.objects.create(
             group=self.post_1.group,
             author=self.post_1.author,
             text='Текст для тестирования'
         )
-        cache.clear()
-        response = self.guest_client.get(reverse('posts:index'))
-        content_after = response.content
-        self.assertNotEqual(content_before, content_after)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, post.text)
         post.delete()
-        response = self.guest_client.get(reverse('posts:index'))
-        content_after_delete_post = response.content
-        self.assertEqual(content_after, content_after_delete_post)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertNotContains(response, post.text)
+
+    def test_posts_cache_drops_on_group_change(self):
+        """Пост, ушедший из группы, пропадает с её страницы."""
+        url = reverse('posts:group_list', kwargs={
+            'slug': self.post_1.group.slug})
+        self.assertContains(self.guest_client.get(url), self.post_1.text)
+        post = Post.objects.get(pk=self.post_1.pk)
+        post.group = None
+        post.save()
+        self.assertNotContains(self.guest_client.get(url), self.post_1.text)
+
+    def test_post_detail_cache_drops_on_comment(self):
+        """Новый комментарий сразу виден на странице поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post_1.pk})
+        self.guest_client.get(url)
+        Comment.objects.create(
+            post=self.post_1, author=self.post_1.author, text='Ещё один')
+        self.assertContains(self.guest_client.get(url), 'Ещё один')
+
+    def test_profile_cache_drops_on_own_follow(self):
+        """Подписка сразу меняет счётчик подписок на странице читателя."""
+        reader = User.objects.create_user(username='Reader_cache')
+        url = reverse('posts:profile', kwargs={'username': reader.username})
+        self.assertContains(self.guest_client.get(url), 'подписок: 0')
+        Follow.objects.create(user=reader, author=self.post_1.author)
+        self.assertContains(self.guest_client.get(url), 'подписок: 1')
+
+    def test_post_detail_cache_drops_on_group_rename(self):
+        """Новое название группы сразу видно на странице её поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post_1.pk})
+        self.guest_client.get(url)
+        group = Group.objects.get(pk=self.post_1.group_id)
+        group.title = 'Переименованная группа'
+        group.save()
+        self.assertContains(
+            self.guest_client.get(url), 'Переименованная группа')
+
+    def test_cache_drops_on_user_rename(self):
+        """Новое имя автора сразу видно в ленте и под его комментариями."""
+        commenter = User.objects.create_user(username='Commenter_cache')
+        post = Post.objects.create(
+            author=commenter, group=self.post_1.group, text='Пост')
+        Comment.objects.create(
+            post=self.post_1, author=commenter, text='Комментарий')
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={
+                'slug': self.post_1.group.slug}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            reverse('posts:post_detail', kwargs={
+                'post_id': self.post_1.pk}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        commenter.username = 'Renamed_cache'
+        commenter.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Renamed_cache')
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author_page')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.url = reverse('posts:post_detail', kwargs={
+            'post_id': cls.post.pk})
+
+    def setUp(self):
         cache.clear()
-        response = self.guest_client.get(reverse('posts:index'))
-        content_after_delete_cache = response.content
-        self.assertNotEqual(
-            content_after_delete_post, content_after_delete_cache)
+
+    def test_guest_gets_cached_response(self):
+        """Повторный запрос гостя отдаётся из кеша без запросов к базе."""
+        first = self.client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('posts:index'))
+        self.assertIsNone(second.context)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_conditional_get(self):
+        """Совпавший ETag или дата дают 304, пока пост не изменился."""
+        response = self.client.get(self.url)
+        etag, modified = response['ETag'], response['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Новый комментарий')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый комментарий')
+
+    @override_settings(PAGE_CACHE_TTL=0)
+    def test_etag_follows_content(self):
+        """ETag меняется вместе с содержимым, даже без нового поколения.
+
+        Так страница, отрисованная по отстающей реплике, не продлевается
+        ответами 304 после истечения её срока в кеше.
+        """
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.filter(pk=self.post.pk).update(text='Догнавший текст')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Догнавший текст')
+
+    def test_session_bypasses_cache(self):
+        """С сессионной кукой страница отрисовывается заново."""
+        self.client.get(self.url)
+        self.client.force_login(self.author)
+        response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+        self.assertNotIn('ETag', response)
 
 
 class FollowViewTests(TestCase):
@@ -515,3 +698,64 @@ class FollowViewTests(TestCase):
             'username': self.post_1.author.username}))
         after = len(Follow.objects.all().filter(user_id=self.post_1.author.id))
         self.assertEqual(after + 0, before)
+
+
+class FollowCacheViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author_1 = User.objects.create_user(username='Author_1')
+        cls.author_2 = User.objects.create_user(username='Author_2')
+        cls.post_1 = Post.objects.create(
+            author=cls.author_1, text='Тестовый пост от Author_1')
+        cls.post_2 = Post.objects.create(
+            author=cls.author_2, text='Тестовый пост от Author_2')
+
+    def setUp(self):
+        cache.clear()
+        self.user_1 = User.objects.create_user(username='Reader_1')
+        self.user_2 = User.objects.create_user(username='Reader_2')
+        Follow.objects.create(user=self.user_1, author=self.author_1)
+        Follow.objects.create(user=self.user_2, author=self.author_2)
+        self.client_1 = Client()
+        self.client_1.force_login(self.user_1)
+        self.client_2 = Client()
+        self.client_2.force_login(self.user_2)
+
+    def test_follow_cache_is_per_user(self):
+        """Кеш ленты подписок одного читателя не достаётся другому."""
+        self.client_1.get(reverse('posts:follow_index'))
+        response = self.client_2.get(reverse('posts:follow_index'))
+        self.assertContains(response, self.post_2.text)
+        self.assertNotContains(response, self.post_1.text)
+
+    def test_follow_cache_is_per_page(self):
+        """Кеш ленты подписок различает страницы."""
+        Post.objects.bulk_create(
+            Post(author=self.author_1, text=f'Старый пост {i}')
+            for i in range(settings.POSTS_LIMIT))
+        Follow.objects.filter(user=self.user_1).delete()
+        Follow.objects.create(user=self.user_1, author=self.author_1)
+        url = reverse('posts:follow_index')
+        first = self.client_1.get(url)
+        second = self.client_1.get(url, {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+
+    def test_follow_cache_drops_on_new_post(self):
+        """Новый пост автора из подписок виден сразу."""
+        self.client_1.get(reverse('posts:follow_index'))
+        Post.objects.create(author=self.author_1, text='Свежий пост')
+        response = self.client_1.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_follow_cache_drops_on_follow_change(self):
+        """Смена подписок сразу меняет ленту."""
+        self.client_1.get(reverse('posts:follow_index'))
+        self.client_1.get(reverse('posts:profile_follow', kwargs={
+            'username': self.author_2.username}))
+        response = self.client_1.get(reverse('posts:follow_index'))
+        self.assertContains(response, self.post_2.text)
+        self.client_1.get(reverse('posts:profile_unfollow', kwargs={
+            'username': self.author_2.username}))
+        response = self.client_1.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, self.post_2.text)
@@ -0,0 +1,304 @@
+import base64
+import io
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import SuspiciousFileOperation
+from django.templatetags.static import static
+from PIL import Image, ImageOps
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import (
+    DummyImageFile, ImageFile, deserialize_image_file,
+)
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+from .tasks import enqueue, task
+
+# Картинка поста выводится кадром 960x339 в нескольких ширинах для
+# srcset, каждая в исходном формате и в WebP.
+FRAME = (960, 339)
+WIDTHS = (960, 720, 480)
+SIZES = '(max-width: 960px) 100vw, 960px'
+WEBP = {'format': 'WEBP', 'quality': 80}
+# Превью - кадр, ужатый до нескольких пикселей; браузер растягивает его.
+PREVIEW_SIZE = (16, 6)
+
+
+def variant(width, **options):
+    """Геометрия и параметры sorl для кадра шириной width."""
+    height = round(width * FRAME[1] / FRAME[0])
+    return [f'{width}x{height}', {'crop': 'center', 'upscale': True,
+                                  **options}]
+
+
+# Миниатюры, которые выводят шаблоны: готовятся сразу после загрузки.
+VARIANTS = (
+    [variant(width) for width in WIDTHS]
+    + [variant(width, **WEBP) for width in WIDTHS]
+)
+
+
+class Placeholder(DummyImageFile):
+    """Заглушка размером с будущую миниатюру."""
+
+    @property
+    def url(self):
+        return static('img/placeholder.svg')
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Отдаёт только готовые миниатюры и никогда не вызывает Pillow.
+
+    Если миниатюры ещё нет в хранилище ключей sorl, её изготовление
+    ставится в очередь фонового обработчика, а шаблон получает
+    заглушку того же размера.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        thumbnail = self.thumbnail_file(source, geometry_string, options)
+        # Для постов страницы миниатюры уже найдены через prefetch().
+        prefetched = getattr(file_, 'thumbnails', {})
+        if thumbnail.key in prefetched:
+            cached = prefetched[thumbnail.key]
+        else:
+            cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        self.request(source, [geometry_string, options], thumbnail)
+        return Placeholder(geometry_string)
+
+    def request(self, source, variant, thumbnail):
+        """Ставит изготовление миниатюры в очередь не чаще раза в lease.
+
+        Стандартные варианты делает одна задача на картинку, та же, что и
+        после загрузки, поэтому показ страницы пишет в очередь не больше
+        одного раза на картинку. Задачу, исчерпавшую попытки, показ
+        страницы не возрождает.
+        """
+        if variant in VARIANTS:
+            marker, variants = source.name, None
+        else:
+            marker, variants = thumbnail.name, [variant]
+        if not cache.add(f'thumbnails:queued:{marker}', True,
+                         settings.TASK_LEASE):
+            return
+        if variants is None:
+            enqueue(make_thumbnails, name=source.name)
+        else:
+            enqueue(make_thumbnails, name=source.name, variants=variants)
+
+    def thumbnail_file(self, source, geometry_string, options):
+        """Файл миниатюры, под которым она лежит в хранилище ключей."""
+        return ImageFile(self._get_thumbnail_filename(
+            source, geometry_string, self.with_defaults(source, options),
+        ), default.storage)
+
+    def with_defaults(self, source, options):
+        """Параметры миниатюры так, как их дополняет ThumbnailBackend."""
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+
+class KVStore(KVStoreBase):
+    """Хранилище метаданных sorl: таблица sorl и кеш найденного.
+
+    Общее для всех процессов - только таблица. В кеш THUMBNAIL_CACHE
+    (LocMemCache процесса) попадают лишь найденные миниатюры: отсутствие
+    не кешируется, поэтому готовая миниатюра видна сразу после
+    обработчика. get_many читает промахи одним запросом к таблице.
+    """
+
+    @property
+    def cache(self):
+        return caches[thumbnail_settings.THUMBNAIL_CACHE]
+
+    def get_many(self, keys):
+        """Найденные в хранилище файлы по ключам ImageFile.key."""
+        keys = {add_prefix(key): key for key in keys}
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            fetched = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            self.cache.set_many(
+                fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(fetched)
+        return {keys[key]: deserialize_image_file(value)
+                for key, value in found.items()}
+
+    def clear(self, delete_thumbnails=False):
+        self._delete_raw(*self._find_keys_raw(
+            thumbnail_settings.THUMBNAIL_KEY_PREFIX))
+        if delete_thumbnails:
+            self.delete_all_thumbnail_files()
+
+    def _get_raw(self, key):
+        value = self.cache.get(key)
+        if value is None:
+            value = KVStoreModel.objects.filter(key=key).values_list(
+                'value', flat=True).first()
+            if value is not None:
+                self.cache.set(
+                    key, value, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        return value
+
+    def _set_raw(self, key, value):
+        KVStoreModel.objects.update_or_create(
+            key=key, defaults={'value': value})
+        self.cache.set(key, value, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+
+    def _delete_raw(self, *keys):
+        KVStoreModel.objects.filter(key__in=keys).delete()
+        self.cache.delete_many(keys)
+
+    def _find_keys_raw(self, prefix):
+        return list(KVStoreModel.objects.filter(
+            key__startswith=prefix).values_list('key', flat=True))
+
+
+def responsive(post):
+    """Готовые варианты картинки поста для <picture>.
+
+    src - самый широкий кадр исходного формата, а пока его нет -
+    превью из поста или заглушка; srcset и webp_srcset - готовые
+    ширины для браузера. Размер кадра известен заранее, поэтому
+    место под картинку резервируется без чтения её метаданных.
+    """
+    backend = default.backend
+    image = post.image
+
+    def thumbnail(width, **options):
+        geometry_string, options = variant(width, **options)
+        return backend.get_thumbnail(image, geometry_string, **options)
+
+    def srcset(**options):
+        found = ((width, thumbnail(width, **options)) for width in WIDTHS)
+        return ', '.join(
+            f'{ready.url} {width}w' for width, ready in found
+            if not isinstance(ready, Placeholder))
+
+    main = thumbnail(WIDTHS[0])
+    if isinstance(main, Placeholder):
+        src = post.image_placeholder or main.url
+    else:
+        src = main.url
+    return {
+        'src': src,
+        'width': FRAME[0],
+        'height': FRAME[1],
+        'preview': post.image_placeholder,
+        'srcset': srcset(),
+        'webp_srcset': srcset(**WEBP),
+        'sizes': SIZES,
+    }
+
+
+def prefetch(posts, variants=VARIANTS):
+    """Находит миниатюры всех постов страницы за одно обращение.
+
+    Результат запоминается в post.image.thumbnails, и тег thumbnail
+    берёт миниатюры оттуда, не обращаясь к хранилищу для каждого поста.
+    """
+    backend, kvstore = default.backend, default.kvstore
+    if not isinstance(backend, DeferredThumbnailBackend) or not isinstance(
+            kvstore, KVStore):
+        return
+    wanted = [
+        (post.image, [
+            backend.thumbnail_file(
+                ImageFile(post.image), geometry_string, options).key
+            for geometry_string, options in variants
+        ])
+        for post in posts if post.image
+    ]
+    if not wanted:
+        return
+    found = kvstore.get_many({key for _, keys in wanted for key in keys})
+    for image, keys in wanted:
+        image.thumbnails = {key: found.get(key) for key in keys}
+
+
+def describe(post):
+    """Записывает в пост размеры и вес новой картинки.
+
+    Читается только заголовок файла; превью сделает обработчик.
+    Если файл прочитать нельзя, метаданные остаются пустыми.
+    """
+    image = post.image
+    post.image_placeholder = ''
+    post.image_width = post.image_height = post.image_size = None
+    if not image:
+        return
+    try:
+        post.image_width, post.image_height = image.width, image.height
+        post.image_size = image.size
+    except (OSError, SuspiciousFileOperation):
+        post.image_width = post.image_height = post.image_size = None
+
+
+def source(name):
+    """Картинка поста по имени, в хранилище поля Post.image.
+
+    Ключи sorl включают класс хранилища, поэтому обработчик должен
+    открывать картинку в том же хранилище, что и шаблоны.
+    """
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def preview(name):
+    """Превью картинки в виде data: URI на пару сотен байт."""
+    with source(name).storage.open(name) as file_:
+        image = Image.open(file_)
+        image.draft('RGB', (PREVIEW_SIZE[0] * 8, PREVIEW_SIZE[1] * 8))
+        image = ImageOps.fit(image.convert('RGB'), PREVIEW_SIZE)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG', optimize=True)
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()).decode()
+
+
+def discard(name):
+    """Удаляет картинку вместе с миниатюрами и их метаданными."""
+    default.backend.delete(source(name))
+
+
+@task
+def make_thumbnails(name, variants=None):
+    """Готовит миниатюры и превью картинки.
+
+    По умолчанию делаются все варианты из VARIANTS. Посты с картинкой
+    сохраняются с новым превью, и их страницы сбрасываются из кеша.
+    """
+    backend = ThumbnailBackend()
+    for geometry_string, options in variants or VARIANTS:
+        backend.get_thumbnail(source(name), geometry_string, **options)
+    uri = preview(name)
+    for post in Post.objects.filter(image=name).exclude(
+            image_placeholder=uri):
+        post.image_placeholder = uri
+        post.save(update_fields=['image_placeholder'])
+
+
+def schedule(image):
+    """Ставит в очередь все миниатюры только что сохранённой картинки.
+
+    Загрузка - явный источник работы, поэтому задача, исчерпавшая
+    попытки (например, для прежнего файла с тем же именем), ставится
+    заново.
+    """
+    if image:
+        enqueue(make_thumbnails, revive=True, name=image.name)
@@ -0,0 +1,96 @@
+import hashlib
+import posixpath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler,
+)
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл и по пути считает её sha256.
+
+    Файл не держится в памяти целиком, а хеш готов к концу загрузки,
+    и хранилищу не нужно перечитывать файл. Как только загрузка
+    превышает UPLOAD_MAX_SIZE, разбор запроса прекращается: остаток
+    тела не читается, временный файл удаляется, а имя поля остаётся
+    в request.upload_rejected для uploaded_files().
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.received = 0
+        if (self.content_length
+                and self.content_length > settings.UPLOAD_MAX_SIZE):
+            self.reject()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            self.reject()
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def reject(self):
+        self.file.close()
+        self.request.upload_rejected = (
+            self.field_name, self.file_name, self.content_type)
+        raise StopUpload(connection_reset=True)
+
+    def file_complete(self, file_size):
+        file_ = super().file_complete(file_size)
+        file_.content_hash = self.hasher.hexdigest()
+        return file_
+
+
+def uploaded_files(request):
+    """request.FILES для формы или None, если файлов нет.
+
+    Вместо отклонённого файла форма получает пустой файл с пометкой
+    oversized, чтобы показать ошибку у поля.
+    """
+    files = request.FILES
+    rejected = getattr(request, 'upload_rejected', None)
+    if rejected:
+        field_name, file_name, content_type = rejected
+        files = files.copy()
+        files[field_name] = SimpleUploadedFile(file_name, b'', content_type)
+        files[field_name].oversized = True
+    return files or None
+
+
+def content_hash(content):
+    """sha256 файла: посчитанный при загрузке или по его содержимому."""
+    digest = getattr(content, 'content_hash', None)
+    if digest is None:
+        hasher = hashlib.sha256()
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+    return digest
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы под именем из хеша содержимого.
+
+    Файл из posts/photo.jpg ложится в posts/ab/abcd….jpg. Одинаковые
+    файлы получают одно имя, и повторная загрузка не пишет на диск
+    ещё одну копию, а возвращает имя уже сохранённой.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = content_hash(content)
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
@@ -6,6 +6,8 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('search/', views.search_posts, name='search'),
+    path('autocomplete/', views.suggestions, name='autocomplete'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
@@ -14,6 +16,8 @@ urlpatterns = [
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('profile/<str:username>/export/', views.export,
+         name='export'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow/', views.profile_unfollow,
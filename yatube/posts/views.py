@@ -1,64 +1,152 @@
+from urllib.parse import quote
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from django.core.exceptions import PermissionDenied
+from django.http import (
+    HttpResponseBadRequest, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
 
-from django.conf import settings
+from core.db import replica_reads
 
+from . import autocomplete, counters, exporter, thumbnails, uploads
+from .cache import anonymous_page, page_ttl, version
+from .feeds import feed_version, follow_feed
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import ArchivedPost, Follow, Group, Post
+from .pagination import (
+    COMMENT_ORDERING, Keyset, MergedKeyset, page_window, paginate,
+)
+from .search import SearchResults
 
 
 def paginator(posts, request):
-    paginator = Paginator(posts, settings.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(posts, request)
+    thumbnails.prefetch(page_obj)
     return {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'page_range': page_window(page_obj),
     }
 
 
+def group_parts(slug):
+    pk = Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    return pk and [('group', pk)]
+
+
+def profile_parts(username):
+    pk = User.objects.filter(
+        username=username).values_list('pk', flat=True).first()
+    return pk and [('author', pk)]
+
+
+def post_parts(post_id):
+    author_id = (
+        Post.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True).first()
+        or ArchivedPost.objects.filter(pk=post_id).values_list(
+            'author_id', flat=True).first())
+    return author_id and [('post', post_id), ('author', author_id)]
+
+
+@replica_reads
+@anonymous_page(lambda: [('global', 0)])
 def index(request):
     template = 'posts/index.html'
     posts = Post.objects.select_related('group', 'author')
-    context = paginator(posts, request)
+    context = {
+        'cache_version': version(('global', 0)),
+        'cache_ttl': page_ttl(),
+    }
+    context.update(paginator(posts, request))
     return render(request, template, context)
 
 
+@anonymous_page(lambda: [('global', 0)])
+def search_posts(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    posts = SearchResults(query, Post.objects.select_related('group',
+                                                             'author'))
+    context = {
+        'query': query,
+        'page_params': urlencode({'q': query}) + '&' if query else '',
+    }
+    context.update(paginator(posts, request))
+    return render(request, template, context)
+
+
+def suggestions(request):
+    return JsonResponse({
+        'results': autocomplete.search(request.GET.get('q', '')),
+    })
+
+
+@replica_reads
+@anonymous_page(group_parts)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     posts = group.posts.select_related('author')
     context = {
-        'group': group
+        'group': group,
+        'cache_version': version(('group', group.pk)),
+        'cache_ttl': page_ttl(),
     }
     context.update(paginator(posts, request))
     return render(request, template, context)
 
 
+@replica_reads
+@anonymous_page(profile_parts)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.select_related('group')
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    # Старые посты лежат в архиве; страницы считают обе части.
+    author_posts = MergedKeyset(
+        Keyset(author.posts.select_related('group')),
+        Keyset(author.archived_posts.select_related('group')),
+    )
+    counters.user_stats(author)
     following = request.user.is_authenticated and Follow.objects.filter(
         user__username=request.user, author=author).exists()
     context = {
         'author': author,
         'following': following,
+        'cache_version': version(('author', author.pk)),
+        'cache_ttl': page_ttl(),
     }
     context.update(paginator(author_posts, request))
     return render(request, template, context)
 
 
+@replica_reads
+@anonymous_page(post_parts)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post_info = get_object_or_404(Post, pk=post_id)
+    post_info = Post.objects.select_related(
+        'author__stats', 'group').filter(pk=post_id).first()
+    if post_info is None:
+        post_info = get_object_or_404(ArchivedPost.objects.select_related(
+            'author__stats', 'group'), pk=post_id)
+    counters.user_stats(post_info.author)
     form = CommentForm()
-    comments = post_info.comments.all()
+    comments = paginate(Keyset(
+        post_info.comments.select_related('author'),
+        COMMENT_ORDERING,
+    ), request, settings.COMMENTS_LIMIT)
     context = {
         'post_info': post_info,
         'form': form,
         'comments': comments,
+        'comments_range': page_window(comments),
+        'cache_version': version(
+            ('post', post_info.pk), ('author', post_info.author_id)),
+        'cache_ttl': page_ttl(),
     }
     return render(request, template, context)
 
@@ -66,7 +154,8 @@ def post_detail(request, post_id):
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    form = PostForm(request.POST or None,
+                    files=uploads.uploaded_files(request))
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -80,7 +169,7 @@ def post_edit(request, post_id):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, id=post_id)
     form = PostForm(request.POST or None,
-                    files=request.FILES or None,
+                    files=uploads.uploaded_files(request),
                     instance=post)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post.id)
@@ -114,10 +203,15 @@ def add_comment(request, post_id):
 
 
 @login_required
+@replica_reads
 def follow_index(request):
     template = 'posts/follow.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = paginator(posts, request)
+    posts = follow_feed(request.user)
+    context = {
+        'cache_version': feed_version(request.user),
+        'cache_ttl': page_ttl(),
+    }
+    context.update(paginator(posts, request))
     return render(request, template, context)
 
 
@@ -135,3 +229,26 @@ def profile_unfollow(request, username):
     Follow.objects.filter(
         user=request.user, author=following).delete()
     return redirect('posts:profile', username=username)
+
+
+@login_required
+def export(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    file_format = request.GET.get('format', 'jsonl')
+    kind = request.GET.get('kind', 'posts')
+    if file_format == 'zip':
+        content = exporter.zip_chunks(
+            author, images=request.GET.get('images') != '0')
+        filename = f'{author.username}.zip'
+    elif file_format in exporter.FORMATS and kind in exporter.KINDS:
+        content = exporter.lines(author, kind, file_format)
+        filename = f'{author.username}-{kind}.{file_format}'
+    else:
+        return HttpResponseBadRequest()
+    response = StreamingHttpResponse(
+        content, content_type=exporter.CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = (
+        f"attachment; filename*=UTF-8''{quote(filename)}")
+    return response
@@ -7,6 +7,7 @@ app_name = 'users'
 
 urlpatterns = [
     path('signup/', views.SignUp.as_view(), name='signup'),
+    path('delete/', views.delete_account, name='delete_account'),
     path(
         'logout/',
         auth_views.LogoutView.as_view(template_name='users/logged_out.html'),
@@ -1,6 +1,11 @@
+from django.contrib.auth import logout
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 
+from posts.accounts import request_deletion
+
 from .forms import CreationForm
 
 
@@ -8,3 +13,12 @@ class SignUp(CreateView):
     form_class = CreationForm
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
+
+
+@login_required
+def delete_account(request):
+    if request.method != 'POST':
+        return render(request, 'users/delete_account.html')
+    request_deletion(request.user)
+    logout(request)
+    return render(request, 'users/delete_account_done.html')
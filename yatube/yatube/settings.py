@@ -37,7 +37,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -51,7 +53,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.timing.TimedTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,8 +74,44 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами одного потока, а не
+        # открывается заново на каждый запрос.
+        'CONN_MAX_AGE': 60,
     }
 }
+# Настройки каждого соединения с SQLite (core.db). WAL позволяет читать
+# во время записи; synchronous=NORMAL в режиме WAL не теряет целостность
+# при сбое, но не ждёт fsync на каждой транзакции; mmap_size и
+# cache_size (в КиБ при отрицательном значении) держат горячие страницы
+# в памяти; busy_timeout - сколько ждать блокировку записи, мс.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+# Реплики только для чтения: на них идут запросы вью с replica_reads
+# (core.db.ReplicaRouter). Локально реплика - копия основной базы:
+# YATUBE_REPLICA_DB=/tmp/replica.sqlite3 python manage.py sync_replicas.
+# Реплики отстают не больше REPLICA_LAG секунд: столько после записи
+# её автор читает из default, и столько живут страницы с реплик в кеше.
+DATABASE_REPLICAS = []
+if os.environ.get('YATUBE_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['YATUBE_REPLICA_DB'],
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append('replica')
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+REPLICA_LAG = 10
+REPLICA_PIN_COOKIE = 'read_primary'
+# Служебные записи, которые читатель не видит: очередь задач (в том
+# числе миниатюры, заказанные при чтении страницы) и метаданные sorl.
+REPLICA_UNPINNED_MODELS = {'posts.Task', 'thumbnail.KVStore'}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,9 +152,16 @@ LOGGING = {
         }
     },
     'loggers': {
+        # Каждый SQL-запрос в консоль - только при отладке: форматирование
+        # и вывод стоят дороже самих запросов. Сводку по запросу пишет
+        # RequestBudgetMiddleware.
         'django.db.backends': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': 'INFO',
+        },
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': 'WARNING',
         },
     }
 }
@@ -124,15 +169,87 @@ LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
 POSTS_LIMIT = 10
+COMMENTS_LIMIT = 50
+
+# Лента подписок: сколько постов автора попадает в ленту при подписке
+# и размер пачки при раскладке поста по лентам подписчиков.
+FEED_BACKFILL_LIMIT = 1000
+FEED_BATCH_SIZE = 500
+# Посты авторов, у которых подписчиков не меньше порога, не раскладываются
+# по лентам, а подмешиваются при чтении. Набор таких авторов кешируется.
+FEED_PULL_THRESHOLD = 10000
+FEED_PULL_AUTHORS_TTL = 600
+# Кешированные фрагменты страниц версионируются поколениями данных
+# и устаревают сразу при их изменении, поэтому живут долго.
+PAGE_CACHE_TTL = 60 * 60 * 6
+# Фоновые задачи: сколько секунд задача закреплена за обработчиком,
+# базовая задержка перед повтором после ошибки и число попыток.
+TASK_LEASE = 300
+TASK_RETRY_DELAY = 30
+TASK_MAX_ATTEMPTS = 5
+# Миниатюры готовит фоновый обработчик; пока их нет, страницы
+# показывают заглушку того же размера.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+# Хранилище метаданных миниатюр: таблица sorl, общая для процессов, и
+# кеш найденных миниатюр в памяти процесса. Удалённая миниатюра может
+# числиться в кеше других процессов до THUMBNAIL_CACHE_TIMEOUT секунд.
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+THUMBNAIL_CACHE = 'default'
+THUMBNAIL_CACHE_TIMEOUT = 300
+
+# Раздача медиафайлов: None - сам Django через FileResponse (сервер WSGI
+# отдаёт файл через sendfile), 'x-accel' - nginx по X-Accel-Redirect на
+# internal-локацию MEDIA_ACCEL_PREFIX, 'x-sendfile' - Apache или lighttpd.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE = 60 * 60 * 24 * 30
+
+# Поиск ранжирует по bm25 столько самых новых совпадений.
+SEARCH_MAX_RESULTS = 5000
+
+# Подсказки по пользователям и группам: индекс в памяти процесса
+# перестраивается в фоне, если он старше AUTOCOMPLETE_REFRESH секунд.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_REFRESH = 300
+
+# Загрузки пишутся во временный файл с подсчётом sha256 по пути;
+# файлы больше UPLOAD_MAX_SIZE отклоняются, не дописываясь до конца.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.HashingUploadHandler']
+UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+
+# Удаление аккаунта идёт в фоне порциями по ACCOUNT_DELETION_BATCH
+# записей, каждая в своей транзакции, с паузой между ними. Одна часть
+# задачи работает не дольше ACCOUNT_DELETION_BUDGET секунд - меньше
+# TASK_LEASE, чтобы задачу не забрал второй обработчик.
+ACCOUNT_DELETION_BATCH = 200
+ACCOUNT_DELETION_PAUSE = 0.05
+ACCOUNT_DELETION_BUDGET = 60
+
+# Посты старше ARCHIVE_AFTER_DAYS дней команда archive_posts переносит
+# вместе с комментариями в архивные таблицы порциями по
+# ARCHIVE_BATCH_SIZE: главная и страницы групп читают только свежие.
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+
+# Выгрузка постов и комментариев читает базу порциями такого размера.
+EXPORT_CHUNK_SIZE = 2000
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
 }
 
+# Бюджет запроса: больше REQUEST_QUERY_BUDGET запросов к базе или
+# дольше REQUEST_TIME_BUDGET секунд - предупреждение в лог. В
+# REQUEST_BUDGETS - свои пары (запросы, секунды) для имён URL;
+# None снимает ограничение.
+REQUEST_QUERY_BUDGET = 30
+REQUEST_TIME_BUDGET = 0.5
+REQUEST_BUDGETS = {}
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Индекс подсказок строится в фоне, пока процесс принимает запросы.
+from posts import autocomplete  # noqa: E402
+
+autocomplete.warm()